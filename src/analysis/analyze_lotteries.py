@@ -2,8 +2,10 @@
 import sqlite3
 from pathlib import Path
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Tuple
 import logging
+from src.collection.schema import create_position_top_numbers, refresh_position_top_numbers
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -12,8 +14,22 @@ logger = logging.getLogger(__name__)
 # Constants
 DB_PATH = Path(__file__).parent.parent.parent / 'data' / 'lottery.db'
 
-def calculate_frequencies(conn: sqlite3.Connection, lottery_type: str):
-    """Calculate number frequencies and position frequencies for a lottery type."""
+def calculate_frequencies(lottery_type: str):
+    """Calculate number frequencies and position frequencies for a lottery type.
+
+    Each call opens its own connection so lottery types can be analyzed in separate processes.
+    """
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        _calculate_frequencies(conn, lottery_type)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _calculate_frequencies(conn: sqlite3.Connection, lottery_type: str):
+    """Count frequencies for a lottery type and replace its rows in the frequency tables."""
     cursor = conn.cursor()
     
     # Enable dictionary access for rows
@@ -32,10 +48,6 @@ def calculate_frequencies(conn: sqlite3.Connection, lottery_type: str):
     
     logger.info(f"Analyzing {total_draws} draws for {lottery_type}")
     
-    # Clear existing frequency data for this lottery type
-    cursor.execute('DELETE FROM number_frequencies WHERE lottery_type = ?', (lottery_type,))
-    cursor.execute('DELETE FROM position_frequencies WHERE lottery_type = ?', (lottery_type,))
-    
     # Get all draws
     cursor.execute(
         'SELECT winning_numbers, special_ball FROM draws WHERE lottery_type = ?',
@@ -61,6 +73,11 @@ def calculate_frequencies(conn: sqlite3.Connection, lottery_type: str):
         # Count special ball frequencies
         position_counts[6][special_ball] += 1
     
+    # Clear existing frequency data for this lottery type. Done after counting so
+    # the write lock is only held for the short delete/insert transaction.
+    cursor.execute('DELETE FROM number_frequencies WHERE lottery_type = ?', (lottery_type,))
+    cursor.execute('DELETE FROM position_frequencies WHERE lottery_type = ?', (lottery_type,))
+    
     # Insert overall number frequencies
     number_records = []
     for number, count in number_counts.items():
@@ -84,6 +101,9 @@ def calculate_frequencies(conn: sqlite3.Connection, lottery_type: str):
         VALUES (?, ?, ?, ?, ?)
     ''', position_records)
     
+    # Materialize the per-position rankings the API's generate-optimized endpoint reads
+    refresh_position_top_numbers(conn, lottery_type)
+    
     conn.commit()
     logger.info(f"Updated {len(number_records)} number frequencies and {len(position_records)} position frequencies")
 
@@ -91,8 +111,8 @@ def analyze_and_export():
     """Analyze lottery data and update frequency tables."""
     conn = sqlite3.connect(DB_PATH)
     try:
-        # Enable dictionary access for rows
-        conn.row_factory = sqlite3.Row
+        # WAL lets the per-lottery workers read while another one writes
+        conn.execute('PRAGMA journal_mode=WAL')
         
         # Ensure frequency tables exist
         conn.execute('''
@@ -116,10 +136,14 @@ def analyze_and_export():
             )
         ''')
         
-        # Analyze each lottery type
-        for lottery_type in ['powerball', 'mega-millions']:
-            logger.info(f"\nAnalyzing {lottery_type}...")
-            calculate_frequencies(conn, lottery_type)
+        create_position_top_numbers(conn)
+        
+        conn.commit()
+        
+        # Counting is CPU-bound Python, so analyze each lottery type in its own process
+        lottery_types = ['powerball', 'mega-millions']
+        with ProcessPoolExecutor(max_workers=len(lottery_types)) as executor:
+            list(executor.map(calculate_frequencies, lottery_types))
         
         logger.info("\nAnalysis complete!")
         
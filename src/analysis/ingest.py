@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+import pandas as pd
+from pathlib import Path
+from src.analysis.lottery_analysis import split_winning_numbers
+
+# Constants
+DATA_DIR = Path(__file__).parent.parent.parent / 'data' / 'raw'
+
+def convert_csv_to_parquet(csv_path: Path) -> Path:
+    """Write a Parquet copy of a draws CSV with the winning numbers pre-split into int8 columns."""
+    df = split_winning_numbers(pd.read_csv(csv_path))
+    parquet_path = csv_path.with_suffix('.parquet')
+    df.to_parquet(parquet_path, engine='pyarrow', index=False)
+    return parquet_path
+
+def main():
+    for csv_path in sorted(DATA_DIR.glob('*.csv')):
+        parquet_path = convert_csv_to_parquet(csv_path)
+        print(f"Converted {csv_path.name} -> {parquet_path.name}")
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,141 @@
 import pandas as pd
-from collections import Counter, defaultdict
-from typing import List, Dict, Tuple, Set
+from collections import Counter
+from typing import List, Dict, Tuple, Set, Sequence, Optional
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 from dataclasses import dataclass
 import os
 
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; the NumPy path is used without it
+    njit = None
+
 # Constants
 DATA_DIR = 'data/raw'
+PACK_SHIFTS = np.array([40, 32, 24, 16, 8, 0], dtype=np.uint64)  # 8 bits per number
+CSV_BATCH_SIZE = 8192
+PARQUET_COMPRESSION = 'zstd'
+SPECIAL_BALL_COLUMNS = ['Powerball Ball', 'Mega Ball']
+# Below this many rows the one-off JIT compile costs more than it saves
+NUMBA_MIN_ROWS = int(os.environ.get('LOTTERY_NUMBA_MIN_ROWS', 5000))
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _pack_rows(numbers):
+        n = numbers.shape[0]
+        keys = np.empty(n, np.uint64)
+        for i in prange(n):
+            key = np.uint64(0)
+            for j in range(numbers.shape[1]):
+                key = (key << np.uint64(8)) | numbers[i, j]
+            keys[i] = key
+        return keys
+
+    @njit(cache=True)
+    def _aggregate_rows(numbers, main_size, special_size):
+        n = numbers.shape[0]
+        position_counts = np.zeros((5, main_size), np.int64)
+        general_counts = np.zeros(main_size, np.int64)
+        special_counts = np.zeros(special_size, np.int64)
+        keys = np.empty(n, np.uint64)
+        for i in range(n):
+            key = np.uint64(0)
+            for j in range(5):
+                number = numbers[i, j]
+                position_counts[j, number] += 1
+                general_counts[number] += 1
+                key = (key << np.uint64(8)) | np.uint64(number)
+            special = numbers[i, 5]
+            special_counts[special] += 1
+            keys[i] = (key << np.uint64(8)) | np.uint64(special)
+        return position_counts, general_counts, special_counts, keys
+else:
+    _pack_rows = None
+    _aggregate_rows = None
+
+def pack_combinations(numbers: np.ndarray) -> np.ndarray:
+    """Pack each row of an (N, 6) number array into a single uint64 key."""
+    if numbers.ndim != 2 or numbers.shape[1] != len(PACK_SHIFTS):
+        raise ValueError(f"Expected an (N, {len(PACK_SHIFTS)}) number array, got shape {numbers.shape}")
+    if _pack_rows is not None and len(numbers) >= NUMBA_MIN_ROWS:
+        return _pack_rows(np.ascontiguousarray(numbers, dtype=np.uint64))
+    return np.bitwise_or.reduce(numbers.astype(np.uint64) << PACK_SHIFTS, axis=1)
+
+def aggregate_draws(numbers: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Count an (N, 6) draw array in one pass.
+
+    Returns (position_counts, general_counts, special_counts, keys): a (5, M) array of
+    per-position counts, main-number counts, special-ball counts and packed combination keys.
+    """
+    main_size = int(numbers[:, :5].max()) + 1
+    special_size = int(numbers[:, 5].max()) + 1
+    if _aggregate_rows is not None and len(numbers) >= NUMBA_MIN_ROWS:
+        return _aggregate_rows(np.ascontiguousarray(numbers, dtype=np.int64), main_size, special_size)
+    position_counts = np.stack([np.bincount(numbers[:, pos], minlength=main_size) for pos in range(5)])
+    general_counts = np.bincount(numbers[:, :5].ravel(), minlength=main_size)
+    special_counts = np.bincount(numbers[:, 5], minlength=special_size)
+    return position_counts, general_counts, special_counts, pack_combinations(numbers)
+
+def pack_combination(numbers: Sequence[int]) -> Optional[int]:
+    """Pack a single combination into its uint64 key, or None if it cannot be encoded."""
+    if len(numbers) != len(PACK_SHIFTS) or not all(0 <= number <= 0xFF for number in numbers):
+        return None
+    key = 0
+    for number in numbers:
+        key = (key << 8) | int(number)
+    return key
+
+def unpack_combination(key: int) -> Tuple[int, ...]:
+    """Decode a key produced by pack_combinations back into a tuple of numbers."""
+    key = int(key)
+    return tuple((key >> int(shift)) & 0xFF for shift in PACK_SHIFTS)
+
+def split_winning_numbers(df: pd.DataFrame) -> pd.DataFrame:
+    """Add int8 Number_1..Number_N columns parsed from the 'Winning Numbers' strings and downcast the special ball."""
+    numbers = df['Winning Numbers'].astype(str).str.split(expand=True).astype(np.int8)
+    for column in SPECIAL_BALL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype(np.int8)
+    numbers.columns = [f'Number_{i}' for i in range(1, numbers.shape[1] + 1)]
+    return pd.concat([df, numbers], axis=1)
+
+def number_columns(df: pd.DataFrame) -> List[str]:
+    """Get the pre-split Number_* columns of a draws DataFrame."""
+    return [column for column in df.columns if column.startswith('Number_')]
+
+def load_draws(csv_path: str) -> pd.DataFrame:
+    """Load draws with pre-split number columns, preferring an up-to-date Parquet copy of the CSV."""
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if os.path.exists(parquet_path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+    ):
+        return pd.read_parquet(parquet_path)
+    return split_winning_numbers(pd.read_csv(csv_path))
+
+def unpack_combinations(keys: np.ndarray) -> np.ndarray:
+    """Decode an array of packed keys back into an (N, 6) number array."""
+    return ((keys[:, None] >> PACK_SHIFTS) & 0xFF).astype(np.int64)
+
+def percentage_columns(counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the drawn numbers of a bincount array and their share of all counts as percentages."""
+    numbers = np.flatnonzero(counts)
+    return numbers, counts[numbers] / counts.sum() * 100
+
+def write_csv(table: pa.Table, path: str):
+    """Write an Arrow table to CSV with pyarrow's batched writer."""
+    pa_csv.write_csv(table, path, write_options=pa_csv.WriteOptions(include_header=True, batch_size=CSV_BATCH_SIZE))
+
+def write_table(table: pa.Table, path: str, file_format: str = 'csv'):
+    """Write an export table as CSV, or as dictionary-encoded Parquet next to the CSV path."""
+    if file_format == 'parquet':
+        pq.write_table(table, os.path.splitext(path)[0] + '.parquet', compression=PARQUET_COMPRESSION, use_dictionary=True)
+    elif file_format == 'csv':
+        write_csv(table, path)
+    else:
+        raise ValueError(f"Unsupported export format: {file_format}")
 
 @dataclass
 class FrequencyStats:
@@ -16,72 +145,49 @@ class FrequencyStats:
 class LotteryAnalysis:
     def __init__(self, csv_file: str):
         """Initialize the analysis with a CSV file containing lottery data."""
-        self.df = pd.read_csv(os.path.join(DATA_DIR, csv_file))
+        self.df = load_draws(os.path.join(DATA_DIR, csv_file))
+        # Parse draw dates once and keep draws ordered most recent first
+        self.df['Draw Date'] = pd.to_datetime(self.df['Draw Date'])
+        self.df.sort_values('Draw Date', ascending=False, inplace=True)
+        self.df.reset_index(drop=True, inplace=True)
         self.total_draws = len(self.df)
         
-        # Convert winning numbers from space-separated string to list of integers
-        self.df['number_list'] = self.df['Winning Numbers'].apply(lambda x: [int(n) for n in str(x).split()])
+        # Winning numbers as an int8 array pre-split by load_draws; its width follows the CSV's Winning Numbers
+        # field: 6 columns for Powerball, whose strings include the Powerball, and 5 for Mega Millions
+        self._numbers_arr = self.df[number_columns(self.df)].to_numpy()
         
         # Calculate total numbers drawn (5 numbers per draw)
         self.total_numbers = self.total_draws * 5
     
+    @staticmethod
+    def _frequency_stats(counts: np.ndarray, total: int) -> Dict[int, FrequencyStats]:
+        """Build FrequencyStats for every number with a non-zero count."""
+        percentages = counts / total * 100
+        return {
+            int(number): FrequencyStats(count=int(counts[number]), percentage=float(percentages[number]))
+            for number in np.flatnonzero(counts)
+        }
+    
     def analyze_overall_frequencies(self) -> Dict[int, FrequencyStats]:
         """Analyze frequency of each number appearing in any position."""
-        all_numbers = []
-        for numbers in self.df['number_list']:
-            all_numbers.extend(numbers)
-            
-        counter = Counter(all_numbers)
-        frequencies = {}
-        
-        for number, count in counter.items():
-            frequencies[number] = FrequencyStats(
-                count=count,
-                percentage=(count / self.total_numbers) * 100
-            )
-            
-        return frequencies
+        counts = np.bincount(self._numbers_arr.ravel())
+        return self._frequency_stats(counts, self.total_numbers)
     
     def analyze_position_frequencies(self) -> Dict[int, Dict[int, FrequencyStats]]:
         """Analyze frequency of each number appearing in each specific position."""
-        position_numbers = defaultdict(list)
-        
-        # Collect numbers by position
-        for numbers in self.df['number_list']:
-            for pos, num in enumerate(numbers, 1):
-                position_numbers[pos].append(num)
-        
-        position_frequencies = {}
-        for position in range(1, 6):
-            counter = Counter(position_numbers[position])
-            frequencies = {}
-            
-            for number, count in counter.items():
-                frequencies[number] = FrequencyStats(
-                    count=count,
-                    percentage=(count / self.total_draws) * 100
-                )
-                
-            position_frequencies[position] = frequencies
-            
-        return position_frequencies
+        return {
+            position: self._frequency_stats(np.bincount(self._numbers_arr[:, position - 1]), self.total_draws)
+            for position in range(1, 6)
+        }
     
     def analyze_special_ball_frequencies(self, special_ball_column: str) -> Dict[int, FrequencyStats]:
         """Analyze frequency of each special ball number."""
-        counter = Counter(self.df[special_ball_column])
-        frequencies = {}
-        
-        for number, count in counter.items():
-            frequencies[int(number)] = FrequencyStats(
-                count=count,
-                percentage=(count / self.total_draws) * 100
-            )
-            
-        return frequencies
+        counts = np.bincount(self.df[special_ball_column].to_numpy())
+        return self._frequency_stats(counts, self.total_draws)
     
     def analyze_number_combination_frequencies(self) -> Dict[Tuple[int, ...], FrequencyStats]:
         """Analyze frequency of winning number combinations (without special ball)."""
-        combinations = [tuple(sorted(nums)) for nums in self.df['number_list']]
+        combinations = [tuple(sorted(nums)) for nums in self._numbers_arr.tolist()]
         counter = Counter(combinations)
         frequencies = {}
         
@@ -95,21 +201,17 @@ class LotteryAnalysis:
     
     def analyze_full_combination_frequencies(self, special_ball_column: str) -> Dict[Tuple[int, ...], FrequencyStats]:
         """Analyze frequency of complete winning combinations (including special ball)."""
-        full_combinations = []
-        for _, row in self.df.iterrows():
-            numbers = tuple(sorted(row['number_list']) + [int(row[special_ball_column])])
-            full_combinations.append(numbers)
-            
-        counter = Counter(full_combinations)
-        frequencies = {}
+        # Powerball rows carry the special ball as a sixth winning number; keep the five main numbers
+        full_combinations = np.column_stack([
+            np.sort(self._numbers_arr[:, :5], axis=1),
+            self.df[special_ball_column].to_numpy()
+        ])
+        keys, counts = np.unique(pack_combinations(full_combinations), return_counts=True)
         
-        for combination, count in counter.items():
-            frequencies[combination] = FrequencyStats(
-                count=count,
-                percentage=(count / self.total_draws) * 100
-            )
-            
-        return frequencies
+        return {
+            unpack_combination(key): FrequencyStats(count=int(count), percentage=float(count / self.total_draws * 100))
+            for key, count in zip(keys, counts)
+        }
     
     def get_summary_statistics(self, special_ball_column: str) -> Dict:
         """Get comprehensive summary of all analyses."""
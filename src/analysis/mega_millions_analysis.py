@@ -1,45 +1,45 @@
 import pandas as pd
-from collections import Counter, defaultdict
+import numpy as np
+import pyarrow as pa
+from collections import defaultdict
 from typing import List, Dict, Tuple
 import os
-import random
-from src.analysis.lottery_analysis import LotteryAnalysis, FrequencyStats
+from src.analysis.lottery_analysis import (
+    LotteryAnalysis, FrequencyStats, write_table, percentage_columns, aggregate_draws,
+    pack_combination, unpack_combination, unpack_combinations
+)
 
 # Constants
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'raw')
 
+rng = np.random.default_rng()
+
 class MegaMillionsAnalyzer:
     def __init__(self, csv_file: str):
-        """Initialize the MegaMillionsAnalyzer with the CSV file path."""
-        self.df = pd.read_csv(os.path.join(DATA_DIR, csv_file))
-        self.position_frequencies = defaultdict(Counter)
-        self.general_frequencies = Counter()
-        self.megaball_frequencies = Counter()
-        self.combination_frequencies = Counter()
+        """Initialize the MegaMillionsAnalyzer as a view over a shared MegaMillionsAnalysis."""
+        # Share the parsed draws (dates already sorted most recent first) instead of re-reading the CSV
+        self.analysis = MegaMillionsAnalysis(os.path.join(DATA_DIR, csv_file))
+        self.df = self.analysis.df
+        # Winning numbers as an (N, 6) int8 array: 5 main numbers + Mega Ball
+        self._nums = np.column_stack([
+            self.analysis._numbers_arr[:, :5],
+            self.df[self.analysis.special_ball_column].to_numpy(dtype=np.int8)
+        ])
         self.process_data()
 
     def process_data(self):
-        """Process the data and calculate all frequencies."""
-        for _, row in self.df.iterrows():
-            # Split the winning numbers string into a list of numbers
-            numbers = [int(num) for num in row['Winning Numbers'].split()]
-            megaball = int(row['Mega Ball'])
-            
-            # Create full combination including Mega Ball
-            full_combination = tuple(numbers + [megaball])
-            
-            # Track combination frequencies
-            self.combination_frequencies[full_combination] += 1
-            
-            # Track position frequencies for main numbers
-            for pos, num in enumerate(numbers):
-                self.position_frequencies[pos][num] += 1
-                
-            # Track Mega Ball frequencies separately
-            self.megaball_frequencies[megaball] += 1
-                
-            # Track general frequencies (excluding Mega Ball)
-            self.general_frequencies.update(numbers)
+        """Count positions, general numbers, Mega Balls and combinations in one fused pass."""
+        position_counts, self._general_counts, self._special_counts, self._keys = aggregate_draws(self._nums)
+        self.position_frequencies = list(position_counts)
+        
+        # Track combination frequencies keyed by packed uint64 (see pack_combinations)
+        self._combo_keys, self._combo_counts = np.unique(self._keys, return_counts=True)
+        self.combination_frequencies = dict(zip(self._combo_keys.tolist(), self._combo_counts.tolist()))
+        
+        # Index draw dates by combination key so check_combination is a dict lookup
+        self._combo_dates = defaultdict(list)
+        for key, draw_date in zip(self._keys.tolist(), self.df['Draw Date'].dt.strftime('%Y-%m-%d')):
+            self._combo_dates[key].append(draw_date)
 
     def check_combination(self, numbers: List[int], megaball: int) -> Dict:
         """
@@ -55,17 +55,12 @@ class MegaMillionsAnalyzer:
         if len(numbers) != 5:
             return {"error": "Invalid combination. Must provide 5 main numbers"}
         
-        full_combination = tuple(numbers + [megaball])
-        frequency = self.combination_frequencies.get(full_combination, 0)
+        combo_key = pack_combination(numbers + [megaball])
+        frequency = self.combination_frequencies.get(combo_key, 0)
         
         if frequency > 0:
             # Find the dates this combination occurred
-            dates = []
-            for _, row in self.df.iterrows():
-                row_numbers = [int(num) for num in row['Winning Numbers'].split()]
-                row_megaball = int(row['Mega Ball'])
-                if tuple(row_numbers + [row_megaball]) == full_combination:
-                    dates.append(row['Draw Date'])
+            dates = list(self._combo_dates[combo_key])
             
             return {
                 "exists": True,
@@ -83,105 +78,81 @@ class MegaMillionsAnalyzer:
 
     def get_repeated_combinations(self, min_occurrences: int = 2) -> Dict[Tuple[int, ...], int]:
         """Return combinations that appeared more than once."""
-        return {combo: freq for combo, freq in self.combination_frequencies.items() 
+        return {unpack_combination(key): freq for key, freq in self.combination_frequencies.items() 
                 if freq >= min_occurrences}
 
     def get_position_frequencies(self, position: int) -> Dict[int, float]:
         """Get frequency distribution for a specific position (0-4 for main numbers) as percentages."""
-        frequencies = dict(self.position_frequencies[position])
-        total = sum(frequencies.values())
-        return {num: (freq / total * 100) for num, freq in frequencies.items()}
+        counts = self.position_frequencies[position]
+        total = counts.sum()
+        return {int(num): float(counts[num] / total * 100) for num in np.flatnonzero(counts)}
 
     def get_megaball_frequencies(self) -> Dict[int, float]:
         """Get frequency distribution for Mega Ball numbers as percentages."""
-        frequencies = dict(self.megaball_frequencies)
-        total = sum(frequencies.values())
-        return {num: (freq / total * 100) for num, freq in frequencies.items()}
+        numbers, percentages = percentage_columns(self._special_counts)
+        return dict(zip(numbers.tolist(), percentages.tolist()))
 
     def get_general_frequencies(self) -> Dict[int, float]:
         """Get overall frequency distribution of main numbers as percentages."""
-        frequencies = dict(self.general_frequencies)
-        total = sum(frequencies.values())
-        return {num: (freq / total * 100) for num, freq in frequencies.items()}
+        numbers, percentages = percentage_columns(self._general_counts)
+        return dict(zip(numbers.tolist(), percentages.tolist()))
 
     def optimize_dataframe(self) -> pd.DataFrame:
-        """Create an optimized DataFrame with separate columns for each number."""
-        optimized_data = []
-        
-        for _, row in self.df.iterrows():
-            numbers = [int(num) for num in row['Winning Numbers'].split()]
-            entry = {
-                'Draw_Date': row['Draw Date'],
-                'Number_1': numbers[0],
-                'Number_2': numbers[1],
-                'Number_3': numbers[2],
-                'Number_4': numbers[3],
-                'Number_5': numbers[4],
-                'Mega_Ball': int(row['Mega Ball']),
-                'Multiplier': row['Multiplier'],
-                'Original_Combination': f"{row['Winning Numbers']} MB:{row['Mega Ball']}"
-            }
-            optimized_data.append(entry)
-            
-        return pd.DataFrame(optimized_data)
+        """Create an optimized DataFrame with separate int8 columns for each number."""
+        return pd.DataFrame({
+            'Draw_Date': self.df['Draw Date'].values,
+            'Number_1': self._nums[:, 0],
+            'Number_2': self._nums[:, 1],
+            'Number_3': self._nums[:, 2],
+            'Number_4': self._nums[:, 3],
+            'Number_5': self._nums[:, 4],
+            'Mega_Ball': self._nums[:, 5],
+            'Multiplier': pd.to_numeric(self.df['Multiplier'], errors='coerce').astype(np.float32).values,
+            'Original_Combination': (self.df['Winning Numbers'] + ' MB:' + self.df['Mega Ball'].astype(str)).values
+        })
 
-    def export_analysis(self, output_dir: str = "analysis_results"):
-        """Export all analysis results to CSV files."""
+    def export_analysis(self, output_dir: str = "analysis_results", file_format: str = 'csv'):
+        """Export all analysis results to CSV files, or Parquet files when file_format is 'parquet'."""
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
         # Export repeated combinations
-        repeated_data = []
-        total_draws = len(self.df)
-        for combo, freq in self.get_repeated_combinations().items():
-            main_numbers = combo[:-1]
-            mega_ball = combo[-1]
-            repeated_data.append({
-                'Main_Numbers': ' '.join(map(str, sorted(main_numbers))),
-                'Mega_Ball': mega_ball,
-                'Frequency': freq,
-                'Percentage': (freq / total_draws * 100)
-            })
-        pd.DataFrame(repeated_data).sort_values(by=['Main_Numbers', 'Mega_Ball']).to_csv(f"{output_dir}/mega_millions_repeated_combinations.csv", index=False)
+        repeated = self._combo_counts >= 2
+        combos = unpack_combinations(self._combo_keys[repeated])
+        frequencies = self._combo_counts[repeated]
+        write_table(
+            pa.table({
+                'Main_Numbers': [' '.join(map(str, numbers)) for numbers in np.sort(combos[:, :5], axis=1).tolist()],
+                'Mega_Ball': combos[:, 5],
+                'Frequency': frequencies,
+                'Percentage': frequencies / len(self.df) * 100
+            }).sort_by([('Main_Numbers', 'ascending'), ('Mega_Ball', 'ascending')]),
+            f"{output_dir}/mega_millions_repeated_combinations.csv",
+            file_format
+        )
         
-        # Export position frequencies
-        position_data = []
-        for pos in range(5):
-            frequencies = self.get_position_frequencies(pos)
-            for number, percentage in sorted(frequencies.items()):
-                position_data.append({
-                    'Position': pos + 1,
-                    'Number': number,
-                    'Percentage': percentage
-                })
-        pd.DataFrame(position_data).sort_values(by=['Position', 'Number']).to_csv(f"{output_dir}/mega_millions_position_frequencies.csv", index=False)
+        # Export position frequencies, one block of rows per position
+        columns = [percentage_columns(counts) for counts in self.position_frequencies]
+        write_table(pa.table({
+            'Position': np.repeat(np.arange(1, 6), [len(numbers) for numbers, _ in columns]),
+            'Number': np.concatenate([numbers for numbers, _ in columns]),
+            'Percentage': np.concatenate([percentages for _, percentages in columns])
+        }), f"{output_dir}/mega_millions_position_frequencies.csv", file_format)
         
         # Export Mega Ball frequencies
-        mega_data = []
-        mega_frequencies = self.get_megaball_frequencies()
-        for number, percentage in sorted(mega_frequencies.items()):
-            mega_data.append({
-                'Mega_Ball': number,
-                'Percentage': percentage
-            })
-        pd.DataFrame(mega_data).sort_values(by=['Mega_Ball']).to_csv(f"{output_dir}/mega_millions_megaball_frequencies.csv", index=False)
+        numbers, percentages = percentage_columns(self._special_counts)
+        write_table(pa.table({'Mega_Ball': numbers, 'Percentage': percentages}), f"{output_dir}/mega_millions_megaball_frequencies.csv", file_format)
         
         # Export general frequencies
-        general_data = []
-        general_frequencies = self.get_general_frequencies()
-        for number, percentage in sorted(general_frequencies.items()):
-            general_data.append({
-                'Number': number,
-                'Percentage': percentage
-            })
-        pd.DataFrame(general_data).sort_values(by=['Number']).to_csv(f"{output_dir}/mega_millions_general_frequencies.csv", index=False)
+        numbers, percentages = percentage_columns(self._general_counts)
+        write_table(pa.table({'Number': numbers, 'Percentage': percentages}), f"{output_dir}/mega_millions_general_frequencies.csv", file_format)
         
         # Export optimized data
+        # Draws are already in descending date order (most recent first)
         optimized_df = self.optimize_dataframe()
-        # Sort by date in descending order (most recent first)
-        optimized_df['Draw_Date'] = pd.to_datetime(optimized_df['Draw_Date'])
-        optimized_df = optimized_df.sort_values(by='Draw_Date', ascending=False)
-        optimized_df.to_csv(f"{output_dir}/mega_millions_optimized_data.csv", index=False)
+        optimized_table = pa.Table.from_pandas(optimized_df, preserve_index=False)
+        optimized_table = optimized_table.set_column(0, 'Draw_Date', optimized_table['Draw_Date'].cast(pa.date32()))
+        write_table(optimized_table, f"{output_dir}/mega_millions_optimized_data.csv", file_format)
 
     def generate_unique_combination(self) -> Dict:
         """
@@ -200,13 +171,12 @@ class MegaMillionsAnalyzer:
         
         while attempts < max_attempts:
             # Generate 5 unique main numbers between 1-70
-            main_numbers = sorted(random.sample(range(1, 71), 5))
+            main_numbers = np.sort(rng.choice(70, 5, replace=False) + 1).tolist()
             # Generate Mega Ball number between 1-25
-            megaball = random.randint(1, 25)
+            megaball = int(rng.integers(1, 26))
             
-            # Check if this combination exists
-            result = self.check_combination(main_numbers, megaball)
-            if not result["exists"]:
+            # Check if this combination exists with a single hash probe on its packed key
+            if pack_combination(main_numbers + [megaball]) not in self.combination_frequencies:
                 return {
                     "main_numbers": main_numbers,
                     "mega_ball": megaball,
@@ -227,23 +197,20 @@ class MegaMillionsAnalyzer:
         Returns:
             List of dictionaries containing dates and winning numbers
         """
-        # Convert Draw Date to datetime for proper sorting
-        self.df['Draw Date'] = pd.to_datetime(self.df['Draw Date'])
-        
-        # Sort by date in descending order and get the latest entries
-        latest_draws = self.df.sort_values('Draw Date', ascending=False).head(limit)
-        
-        # Convert back to string format for JSON serialization
-        latest_draws['Draw Date'] = latest_draws['Draw Date'].dt.strftime('%Y-%m-%d')
+        # Draws are already sorted most recent first, so only the head is formatted
+        latest_draws = self.df.head(limit)
         
         results = []
-        for _, row in latest_draws.iterrows():
-            numbers = [int(num) for num in row['Winning Numbers'].split()]
+        for draw_date, numbers, multiplier in zip(
+            latest_draws['Draw Date'].dt.strftime('%Y-%m-%d'),
+            self._nums[:limit].tolist(),
+            latest_draws['Multiplier']
+        ):
             results.append({
-                'draw_date': row['Draw Date'],
-                'main_numbers': numbers,
-                'mega_ball': int(row['Mega Ball']),
-                'multiplier': row['Multiplier']
+                'draw_date': draw_date,
+                'main_numbers': numbers[:5],
+                'mega_ball': numbers[5],
+                'multiplier': multiplier
             })
         
         return results
@@ -260,7 +227,10 @@ class MegaMillionsAnalysis(LotteryAnalysis):
         self.main_numbers_range = (1, 70)  # Main numbers range
 
     def get_analysis(self) -> Dict:
-        """Get comprehensive Mega Millions analysis."""
+        """Get comprehensive Mega Millions analysis, computed once and cached."""
+        if self._analysis is not None:
+            return self._analysis
+        
         stats = self.get_summary_statistics(self.special_ball_column)
         
         # Add Mega Millions specific statistics
@@ -271,26 +241,32 @@ class MegaMillionsAnalysis(LotteryAnalysis):
             'coverage_statistics': self.calculate_coverage_statistics()
         })
         
+        self._analysis = stats
         return stats
     
+    def invalidate(self):
+        """Drop the cached analysis so the next get_analysis call recomputes it."""
+        self._analysis = None
+    
     def calculate_coverage_statistics(self) -> Dict:
         """Calculate how much of the possible number space has been used."""
-        # Analyze main numbers coverage
-        used_numbers = set()
-        for numbers in self.df['number_list']:
-            used_numbers.update(numbers)
+        main_max = self.main_numbers_range[1]
+        special_max = self.special_ball_range[1]
         
-        main_numbers_coverage = (len(used_numbers) / 70) * 100
+        # Analyze main numbers coverage with a bitmap over the number range; numbers from older,
+        # wider ranges grow the bitmap and count as used, as the set-based version did
+        main_mask = np.bincount(self._numbers_arr.ravel(), minlength=main_max + 1) > 0
+        main_numbers_coverage = np.count_nonzero(main_mask) / main_max * 100
         
         # Analyze Mega Ball coverage
-        used_mega_balls = set(self.df[self.special_ball_column].astype(int))
-        mega_ball_coverage = (len(used_mega_balls) / 25) * 100
+        special_mask = np.bincount(self.df[self.special_ball_column].to_numpy(), minlength=special_max + 1) > 0
+        mega_ball_coverage = np.count_nonzero(special_mask) / special_max * 100
         
         return {
             'main_numbers_coverage': main_numbers_coverage,
             'mega_ball_coverage': mega_ball_coverage,
-            'unused_main_numbers': sorted(set(range(1, 71)) - used_numbers),
-            'unused_mega_balls': sorted(set(range(1, 26)) - used_mega_balls)
+            'unused_main_numbers': (np.flatnonzero(~main_mask[1:main_max + 1]) + 1).tolist(),
+            'unused_mega_balls': (np.flatnonzero(~special_mask[1:special_max + 1]) + 1).tolist()
         }
 
 def main():
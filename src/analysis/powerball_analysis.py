@@ -1,43 +1,45 @@
 import pandas as pd
-from collections import Counter, defaultdict
+import numpy as np
+import pyarrow as pa
+from collections import defaultdict
 from typing import List, Dict, Tuple
 import os
-import random
-from src.analysis.lottery_analysis import LotteryAnalysis, FrequencyStats
+from src.analysis.lottery_analysis import (
+    LotteryAnalysis, FrequencyStats, write_table, percentage_columns, aggregate_draws,
+    pack_combination, unpack_combination, unpack_combinations
+)
 
 # Constants
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'raw')
 
+rng = np.random.default_rng()
+
 class PowerballAnalyzer:
     def __init__(self, csv_file: str):
-        """Initialize the PowerballAnalyzer with the CSV file path."""
-        self.df = pd.read_csv(os.path.join(DATA_DIR, csv_file))
-        self.position_frequencies = defaultdict(Counter)
-        self.general_frequencies = Counter()
-        self.powerball_frequencies = Counter()  # New counter for Powerball numbers
-        self.combination_frequencies = Counter()
+        """Initialize the PowerballAnalyzer as a view over a shared PowerballAnalysis."""
+        # Share the parsed draws (dates already sorted most recent first) instead of re-reading the CSV
+        self.analysis = PowerballAnalysis(os.path.join(DATA_DIR, csv_file))
+        self.df = self.analysis.df
+        # Winning numbers as an (N, 6) int8 array: 5 main numbers + Powerball
+        self._nums = np.column_stack([
+            self.analysis._numbers_arr[:, :5],
+            self.df[self.analysis.special_ball_column].to_numpy(dtype=np.int8)
+        ])
         self.process_data()
 
     def process_data(self):
-        """Process the data and calculate all frequencies."""
-        for _, row in self.df.iterrows():
-            # Split the winning numbers string into a list of numbers
-            numbers = [int(num) for num in row['Winning Numbers'].split()]
-            main_numbers = numbers[:5]  # First 5 numbers
-            powerball = numbers[5]      # Last number is Powerball
-            
-            # Track combination frequencies
-            self.combination_frequencies[tuple(numbers)] += 1
-            
-            # Track position frequencies for main numbers
-            for pos, num in enumerate(main_numbers):
-                self.position_frequencies[pos][num] += 1
-                
-            # Track Powerball frequencies separately
-            self.powerball_frequencies[powerball] += 1
-                
-            # Track general frequencies (excluding Powerball)
-            self.general_frequencies.update(main_numbers)
+        """Count positions, general numbers, Powerballs and combinations in one fused pass."""
+        position_counts, self._general_counts, self._special_counts, self._keys = aggregate_draws(self._nums)
+        self.position_frequencies = list(position_counts)
+        
+        # Track combination frequencies keyed by packed uint64 (see pack_combinations)
+        self._combo_keys, self._combo_counts = np.unique(self._keys, return_counts=True)
+        self.combination_frequencies = dict(zip(self._combo_keys.tolist(), self._combo_counts.tolist()))
+        
+        # Index draw dates by combination key so check_combination is a dict lookup
+        self._combo_dates = defaultdict(list)
+        for key, draw_date in zip(self._keys.tolist(), self.df['Draw Date'].dt.strftime('%Y-%m-%d')):
+            self._combo_dates[key].append(draw_date)
 
     def check_combination(self, numbers: List[int]) -> Dict:
         """
@@ -52,16 +54,12 @@ class PowerballAnalyzer:
         if len(numbers) != 6:
             return {"error": "Invalid combination. Must provide 6 numbers (5 main numbers + Powerball)"}
         
-        combo_tuple = tuple(numbers)
-        frequency = self.combination_frequencies.get(combo_tuple, 0)
+        combo_key = pack_combination(numbers)
+        frequency = self.combination_frequencies.get(combo_key, 0)
         
         if frequency > 0:
             # Find the dates this combination occurred
-            dates = []
-            for _, row in self.df.iterrows():
-                row_numbers = [int(num) for num in row['Winning Numbers'].split()]
-                if tuple(row_numbers) == combo_tuple:
-                    dates.append(row['Draw Date'])
+            dates = list(self._combo_dates[combo_key])
             
             return {
                 "exists": True,
@@ -79,105 +77,81 @@ class PowerballAnalyzer:
 
     def get_repeated_combinations(self, min_occurrences: int = 2) -> Dict[Tuple[int, ...], int]:
         """Return combinations that appeared more than once."""
-        return {combo: freq for combo, freq in self.combination_frequencies.items() 
+        return {unpack_combination(key): freq for key, freq in self.combination_frequencies.items() 
                 if freq >= min_occurrences}
 
     def get_position_frequencies(self, position: int) -> Dict[int, float]:
         """Get frequency distribution for a specific position (0-4 for main numbers) as percentages."""
-        frequencies = dict(self.position_frequencies[position])
-        total = sum(frequencies.values())
-        return {num: (freq / total * 100) for num, freq in frequencies.items()}
+        counts = self.position_frequencies[position]
+        total = counts.sum()
+        return {int(num): float(counts[num] / total * 100) for num in np.flatnonzero(counts)}
 
     def get_powerball_frequencies(self) -> Dict[int, float]:
         """Get frequency distribution for Powerball numbers as percentages."""
-        frequencies = dict(self.powerball_frequencies)
-        total = sum(frequencies.values())
-        return {num: (freq / total * 100) for num, freq in frequencies.items()}
+        numbers, percentages = percentage_columns(self._special_counts)
+        return dict(zip(numbers.tolist(), percentages.tolist()))
 
     def get_general_frequencies(self) -> Dict[int, float]:
         """Get overall frequency distribution of main numbers (excluding Powerball) as percentages."""
-        frequencies = dict(self.general_frequencies)
-        total = sum(frequencies.values())
-        return {num: (freq / total * 100) for num, freq in frequencies.items()}
+        numbers, percentages = percentage_columns(self._general_counts)
+        return dict(zip(numbers.tolist(), percentages.tolist()))
 
     def optimize_dataframe(self) -> pd.DataFrame:
-        """Create an optimized DataFrame with separate columns for each number."""
-        optimized_data = []
-        
-        for _, row in self.df.iterrows():
-            numbers = [int(num) for num in row['Winning Numbers'].split()]
-            entry = {
-                'Draw_Date': row['Draw Date'],
-                'Number_1': numbers[0],
-                'Number_2': numbers[1],
-                'Number_3': numbers[2],
-                'Number_4': numbers[3],
-                'Number_5': numbers[4],
-                'Powerball': numbers[5],
-                'Multiplier': row['Multiplier'],
-                'Original_Combination': row['Winning Numbers']
-            }
-            optimized_data.append(entry)
-            
-        return pd.DataFrame(optimized_data)
+        """Create an optimized DataFrame with separate int8 columns for each number."""
+        return pd.DataFrame({
+            'Draw_Date': self.df['Draw Date'].values,
+            'Number_1': self._nums[:, 0],
+            'Number_2': self._nums[:, 1],
+            'Number_3': self._nums[:, 2],
+            'Number_4': self._nums[:, 3],
+            'Number_5': self._nums[:, 4],
+            'Powerball': self._nums[:, 5],
+            'Multiplier': pd.to_numeric(self.df['Multiplier'], errors='coerce').astype(np.float32).values,
+            'Original_Combination': self.df['Winning Numbers'].values
+        })
 
-    def export_analysis(self, output_dir: str = "analysis_results"):
-        """Export all analysis results to CSV files."""
+    def export_analysis(self, output_dir: str = "analysis_results", file_format: str = 'csv'):
+        """Export all analysis results to CSV files, or Parquet files when file_format is 'parquet'."""
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
         # Export repeated combinations
-        repeated_data = []
-        total_draws = len(self.df)
-        for combo, freq in self.get_repeated_combinations().items():
-            main_numbers = combo[:5]
-            powerball = combo[5]
-            repeated_data.append({
-                'Main_Numbers': ' '.join(map(str, sorted(main_numbers))),
-                'Powerball': powerball,
-                'Frequency': freq,
-                'Percentage': (freq / total_draws * 100)
-            })
-        pd.DataFrame(repeated_data).sort_values(by=['Main_Numbers', 'Powerball']).to_csv(f"{output_dir}/powerball_repeated_combinations.csv", index=False)
+        repeated = self._combo_counts >= 2
+        combos = unpack_combinations(self._combo_keys[repeated])
+        frequencies = self._combo_counts[repeated]
+        write_table(
+            pa.table({
+                'Main_Numbers': [' '.join(map(str, numbers)) for numbers in np.sort(combos[:, :5], axis=1).tolist()],
+                'Powerball': combos[:, 5],
+                'Frequency': frequencies,
+                'Percentage': frequencies / len(self.df) * 100
+            }).sort_by([('Main_Numbers', 'ascending'), ('Powerball', 'ascending')]),
+            f"{output_dir}/powerball_repeated_combinations.csv",
+            file_format
+        )
         
-        # Export position frequencies
-        position_data = []
-        for pos in range(5):  # Only main numbers positions
-            frequencies = self.get_position_frequencies(pos)
-            for number, percentage in sorted(frequencies.items()):
-                position_data.append({
-                    'Position': pos + 1,
-                    'Number': number,
-                    'Percentage': percentage
-                })
-        pd.DataFrame(position_data).sort_values(by=['Position', 'Number']).to_csv(f"{output_dir}/powerball_position_frequencies.csv", index=False)
+        # Export position frequencies, one block of rows per position
+        columns = [percentage_columns(counts) for counts in self.position_frequencies]
+        write_table(pa.table({
+            'Position': np.repeat(np.arange(1, 6), [len(numbers) for numbers, _ in columns]),
+            'Number': np.concatenate([numbers for numbers, _ in columns]),
+            'Percentage': np.concatenate([percentages for _, percentages in columns])
+        }), f"{output_dir}/powerball_position_frequencies.csv", file_format)
         
         # Export Powerball frequencies
-        powerball_data = []
-        powerball_frequencies = self.get_powerball_frequencies()
-        for number, percentage in sorted(powerball_frequencies.items()):
-            powerball_data.append({
-                'Powerball': number,
-                'Percentage': percentage
-            })
-        pd.DataFrame(powerball_data).sort_values(by=['Powerball']).to_csv(f"{output_dir}/powerball_specific_frequencies.csv", index=False)
+        numbers, percentages = percentage_columns(self._special_counts)
+        write_table(pa.table({'Powerball': numbers, 'Percentage': percentages}), f"{output_dir}/powerball_specific_frequencies.csv", file_format)
         
         # Export general frequencies
-        general_data = []
-        general_frequencies = self.get_general_frequencies()
-        for number, percentage in sorted(general_frequencies.items()):
-            general_data.append({
-                'Number': number,
-                'Percentage': percentage
-            })
-        pd.DataFrame(general_data).sort_values(by=['Number']).to_csv(f"{output_dir}/powerball_general_frequencies.csv", index=False)
+        numbers, percentages = percentage_columns(self._general_counts)
+        write_table(pa.table({'Number': numbers, 'Percentage': percentages}), f"{output_dir}/powerball_general_frequencies.csv", file_format)
         
         # Export optimized data
+        # Draws are already in descending date order (most recent first)
         optimized_df = self.optimize_dataframe()
-        # Sort by date in descending order (most recent first)
-        optimized_df['Draw_Date'] = pd.to_datetime(optimized_df['Draw_Date'])
-        optimized_df = optimized_df.sort_values(by='Draw_Date', ascending=False)
-        optimized_df.to_csv(f"{output_dir}/powerball_optimized_data.csv", index=False)
+        optimized_table = pa.Table.from_pandas(optimized_df, preserve_index=False)
+        optimized_table = optimized_table.set_column(0, 'Draw_Date', optimized_table['Draw_Date'].cast(pa.date32()))
+        write_table(optimized_table, f"{output_dir}/powerball_optimized_data.csv", file_format)
 
     def generate_unique_combination(self) -> Dict:
         """
@@ -196,13 +170,12 @@ class PowerballAnalyzer:
         
         while attempts < max_attempts:
             # Generate 5 unique main numbers between 1-69
-            main_numbers = sorted(random.sample(range(1, 70), 5))
+            main_numbers = np.sort(rng.choice(69, 5, replace=False) + 1).tolist()
             # Generate Powerball number between 1-26
-            powerball = random.randint(1, 26)
+            powerball = int(rng.integers(1, 27))
             
-            # Check if this combination exists
-            result = self.check_combination(main_numbers + [powerball])
-            if not result["exists"]:
+            # Check if this combination exists with a single hash probe on its packed key
+            if pack_combination(main_numbers + [powerball]) not in self.combination_frequencies:
                 return {
                     "main_numbers": main_numbers,
                     "powerball": powerball,
@@ -223,23 +196,20 @@ class PowerballAnalyzer:
         Returns:
             List of dictionaries containing dates and winning numbers
         """
-        # Convert Draw Date to datetime for proper sorting
-        self.df['Draw Date'] = pd.to_datetime(self.df['Draw Date'])
-        
-        # Sort by date in descending order and get the latest entries
-        latest_draws = self.df.sort_values('Draw Date', ascending=False).head(limit)
-        
-        # Convert back to string format for JSON serialization
-        latest_draws['Draw Date'] = latest_draws['Draw Date'].dt.strftime('%Y-%m-%d')
+        # Draws are already sorted most recent first, so only the head is formatted
+        latest_draws = self.df.head(limit)
         
         results = []
-        for _, row in latest_draws.iterrows():
-            numbers = [int(num) for num in row['Winning Numbers'].split()]
+        for draw_date, numbers, multiplier in zip(
+            latest_draws['Draw Date'].dt.strftime('%Y-%m-%d'),
+            self._nums[:limit].tolist(),
+            latest_draws['Multiplier']
+        ):
             results.append({
-                'draw_date': row['Draw Date'],
+                'draw_date': draw_date,
                 'main_numbers': numbers[:5],
                 'powerball': numbers[5],
-                'multiplier': row['Multiplier']
+                'multiplier': multiplier
             })
         
         return results
@@ -256,7 +226,10 @@ class PowerballAnalysis(LotteryAnalysis):
         self.main_numbers_range = (1, 69)  # Main numbers range
 
     def get_analysis(self) -> Dict:
-        """Get comprehensive Powerball analysis."""
+        """Get comprehensive Powerball analysis, computed once and cached."""
+        if self._analysis is not None:
+            return self._analysis
+        
         stats = self.get_summary_statistics(self.special_ball_column)
         
         # Add Powerball specific statistics
@@ -267,26 +240,32 @@ class PowerballAnalysis(LotteryAnalysis):
             'coverage_statistics': self.calculate_coverage_statistics()
         })
         
+        self._analysis = stats
         return stats
     
+    def invalidate(self):
+        """Drop the cached analysis so the next get_analysis call recomputes it."""
+        self._analysis = None
+    
     def calculate_coverage_statistics(self) -> Dict:
         """Calculate how much of the possible number space has been used."""
-        # Analyze main numbers coverage
-        used_numbers = set()
-        for numbers in self.df['number_list']:
-            used_numbers.update(numbers)
+        main_max = self.main_numbers_range[1]
+        special_max = self.special_ball_range[1]
         
-        main_numbers_coverage = (len(used_numbers) / 69) * 100
+        # Analyze main numbers coverage with a bitmap over the number range; numbers from older,
+        # wider ranges grow the bitmap and count as used, as the set-based version did
+        main_mask = np.bincount(self._numbers_arr.ravel(), minlength=main_max + 1) > 0
+        main_numbers_coverage = np.count_nonzero(main_mask) / main_max * 100
         
         # Analyze Powerball coverage
-        used_powerballs = set(self.df[self.special_ball_column].astype(int))
-        powerball_coverage = (len(used_powerballs) / 26) * 100
+        special_mask = np.bincount(self.df[self.special_ball_column].to_numpy(), minlength=special_max + 1) > 0
+        powerball_coverage = np.count_nonzero(special_mask) / special_max * 100
         
         return {
             'main_numbers_coverage': main_numbers_coverage,
             'powerball_coverage': powerball_coverage,
-            'unused_main_numbers': sorted(set(range(1, 70)) - used_numbers),
-            'unused_powerballs': sorted(set(range(1, 27)) - used_powerballs)
+            'unused_main_numbers': (np.flatnonzero(~main_mask[1:main_max + 1]) + 1).tolist(),
+            'unused_powerballs': (np.flatnonzero(~special_mask[1:special_max + 1]) + 1).tolist()
         }
 
 def main():
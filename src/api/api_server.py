@@ -1,19 +1,129 @@
-from fastapi import FastAPI, HTTPException, Query
-from typing import List, Dict, Optional, Annotated, Any
-from pydantic import BaseModel, conlist
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from typing import List, Dict, Optional, Annotated, Any, Tuple
+from pydantic import BaseModel, conlist, TypeAdapter
 import sqlite3
 from pathlib import Path
 import random
+import bisect
 from enum import Enum
+from contextlib import contextmanager, asynccontextmanager
+import os
+import queue
+import threading
+import hashlib
+from functools import lru_cache
 import uvicorn
+from src.collection.schema import check_draws_schema, ensure_position_top_numbers, numbers_key
 
 # Constants
 DB_PATH = Path(__file__).parent.parent.parent / 'data' / 'lottery.db'
+POOL_SIZE = os.cpu_count() or 4  # Read-only connections shared by request handlers
+STATEMENT_CACHE_SIZE = 64  # Compiled statements kept per connection
+RANDOM_ATTEMPTS = 100  # Random candidates checked per generate-random request
+CACHE_CONTROL = 'public, max-age=60'  # Results only change when new draws are imported
+MAX_KEY_NUMBER = 255  # Largest number a 1-byte slot of winning_numbers_blob can hold
+CONNECTION_PRAGMAS = [
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-65536',  # 64MB page cache
+    'PRAGMA mmap_size=268435456'  # 256MB memory-mapped I/O
+]
+# Indexes the API's queries rely on, created at startup for databases built before they existed
+STARTUP_INDEXES = {
+    # Covers combination lookups on the 5-byte key: draw_date is read from the index without touching the table
+    'idx_draws_combo_blob': (
+        'CREATE INDEX IF NOT EXISTS idx_draws_combo_blob '
+        'ON draws (lottery_type, winning_numbers_blob, special_ball, draw_date)'
+    )
+}
+
+# SQL statements are module-level constants so each pooled connection's statement cache
+# (keyed by SQL text) compiles every query once and reuses it on later requests
+NUMBER_FREQUENCIES_SQL = '''
+    SELECT number, frequency, percentage
+    FROM number_frequencies
+    WHERE lottery_type = ?
+    ORDER BY number
+'''
+SPECIAL_BALL_FREQUENCIES_SQL = '''
+    SELECT number, frequency, percentage
+    FROM position_frequencies
+    WHERE lottery_type = ? AND position = 6
+    ORDER BY number
+'''
+POSITION_FREQUENCIES_SQL = '''
+    SELECT position, number, frequency, percentage
+    FROM position_frequencies
+    WHERE lottery_type = ? AND position < 6
+    ORDER BY position, number
+'''
+POSITION_FREQUENCIES_BY_POSITION_SQL = '''
+    SELECT position, number, frequency, percentage
+    FROM position_frequencies
+    WHERE lottery_type = ? AND position = ?
+    ORDER BY number
+'''
+MATCHING_DRAWS_SQL = '''
+    SELECT draw_date, special_ball
+    FROM draws
+    WHERE lottery_type = ? AND winning_numbers_blob = ?
+    ORDER BY draw_date DESC
+'''
+POSITION_RANKINGS_SQL = '''
+    SELECT position, number, percentage
+    FROM position_top_numbers
+    WHERE lottery_type = ?
+    ORDER BY position, rank
+'''
+COMBINATION_COUNT_SQL = '''
+    SELECT COUNT(*) as count
+    FROM draws
+    WHERE lottery_type = ? AND winning_numbers_blob = ? AND special_ball = ?
+'''
+EXISTING_CANDIDATES_SQL = f'''
+    SELECT draws.winning_numbers_blob, draws.special_ball
+    FROM (VALUES {', '.join(['(?, ?)'] * RANDOM_ATTEMPTS)}) AS candidates
+    JOIN draws ON draws.winning_numbers_blob = candidates.column1 AND draws.special_ball = candidates.column2
+    WHERE draws.lottery_type = ?
+'''
+TAKEN_REPLACEMENTS_SQL = '''
+    SELECT winning_numbers_blob
+    FROM draws
+    WHERE lottery_type = ? AND special_ball = ? AND winning_numbers_blob IN ({placeholders})
+'''
+TAKEN_SPECIAL_BALLS_SQL = '''
+    SELECT special_ball
+    FROM draws
+    WHERE lottery_type = ? AND winning_numbers_blob = ?
+'''
+DRAW_COUNT_SQL = 'SELECT COUNT(*) as count FROM draws WHERE lottery_type = ?'
+LATEST_DRAWS_SQL = '''
+    SELECT draw_date, n1, n2, n3, n4, n5, special_ball
+    FROM draws
+    WHERE lottery_type = ?
+    ORDER BY draw_date DESC
+    LIMIT ? OFFSET ?
+'''
+
+_read_pool: Optional[queue.Queue] = None
+_write_conn: Optional[sqlite3.Connection] = None
+_write_lock = threading.Lock()
+_data_version: Optional[int] = None  # PRAGMA data_version the caches were built against
+# Per lottery type: position (1-6) -> [(number, percentage)] ordered by frequency, highest first
+_position_rankings: Dict[str, Dict[int, List[Tuple[int, float]]]] = {}
 
 class LotteryType(str, Enum):
     mega_millions = "mega-millions"
     powerball = "powerball"
 
+# Number ranges (max main number, max special ball) and database keys per lottery type
+LOTTERY_PARAMS: Dict[LotteryType, Tuple[int, int]] = {
+    LotteryType.mega_millions: (70, 25),
+    LotteryType.powerball: (69, 26),
+}
+_LT_VALUE: Dict[LotteryType, str] = {lt: lt.value for lt in LotteryType}
+
 class NumberFrequencyResponse(BaseModel):
     number: int
     count: int
@@ -54,357 +164,428 @@ class WinningCombinationsResponse(BaseModel):
     total_count: int
     has_more: bool
 
+# Serialize trusted database rows in one call instead of validating every row again on the way out
+NUMBER_FREQUENCIES_ADAPTER = TypeAdapter(List[NumberFrequencyResponse])
+POSITION_FREQUENCIES_ADAPTER = TypeAdapter(List[PositionFrequencyResponse])
+LATEST_COMBINATIONS_ADAPTER = TypeAdapter(WinningCombinationsResponse)
+
+def _connect(read_only: bool) -> sqlite3.Connection:
+    """Open a connection that can be shared across the server's worker threads."""
+    if read_only:
+        conn = sqlite3.connect(
+            f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+        )
+    else:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    if not read_only:
+        # WAL is persistent in the database file, so the read-write connection sets it once
+        conn.execute('PRAGMA journal_mode=WAL')
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def ensure_indexes(conn: sqlite3.Connection):
+    """Create the indexes the API's queries rely on if the draws table exists."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'draws'").fetchone() is None:
+        return
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    missing = [name for name in STARTUP_INDEXES if name not in existing]
+    for name in missing:
+        conn.execute(STARTUP_INDEXES[name])
+    if missing:
+        # Refresh planner statistics so the new indexes are picked up
+        conn.execute('ANALYZE')
+    conn.commit()
+
+def init_pool():
+    """Open the read-write connection and the pool of read-only connections."""
+    global _read_pool, _write_conn
+    # Opened first so the database file exists before the read-only connections attach
+    _write_conn = _connect(read_only=False)
+    # Draw rows are only migrated by the importer and scraper, never by the API
+    check_draws_schema(_write_conn)
+    ensure_position_top_numbers(_write_conn)
+    ensure_indexes(_write_conn)
+    _read_pool = queue.Queue()
+    for _ in range(POOL_SIZE):
+        _read_pool.put(_connect(read_only=True))
+
+def close_pool():
+    """Close every pooled connection."""
+    global _read_pool, _write_conn, _data_version
+    while _read_pool is not None and not _read_pool.empty():
+        _read_pool.get_nowait().close()
+    if _write_conn is not None:
+        _write_conn.close()
+    _read_pool = None
+    _write_conn = None
+    _data_version = None
+    invalidate_caches()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_pool()
+    yield
+    close_pool()
+
 app = FastAPI(
     title="Lottery Stats API",
     description="API for analyzing Mega Millions and Powerball lottery statistics",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+@contextmanager
 def get_db():
-    """Get database connection."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Enable row factory for dict-like access
-    return conn
+    """Borrow a pooled read-only database connection for the duration of a request."""
+    conn = _read_pool.get()
+    try:
+        yield conn
+    finally:
+        _read_pool.put(conn)
+
+def get_position_rankings(cursor: sqlite3.Cursor, lottery_type: str) -> Dict[int, List[Tuple[int, float]]]:
+    """Get each position's numbers ranked by frequency, querying the database only on a cache miss."""
+    rankings = _position_rankings.get(lottery_type)
+    if rankings is None:
+        # Every position's ranking comes from the materialized position_top_numbers table in one query
+        rankings = {position: [] for position in range(1, 7)}
+        cursor.execute(POSITION_RANKINGS_SQL, (lottery_type,))
+        for position, number, percentage in cursor:
+            rankings[position].append((number, percentage))
+        _position_rankings[lottery_type] = rankings
+    return rankings
+
+def invalidate_caches():
+    """Drop cached query results so they are reloaded after new draws or frequencies are imported."""
+    _position_rankings.clear()
+    number_frequencies_json.cache_clear()
+    position_frequencies_json.cache_clear()
+    latest_first_page_json.cache_clear()
+
+def refresh_caches():
+    """Invalidate the caches if another connection, such as an ingest run, has committed since they were built."""
+    global _data_version
+    with _write_lock:
+        version = _write_conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != _data_version:
+            invalidate_caches()
+            _data_version = version
+
+@lru_cache(maxsize=32)
+def number_frequencies_json(lottery_type: str, category: str) -> bytes:
+    """Get the serialized number frequencies for a lottery and category ('main' or 'special')."""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        if category == 'main':
+            # Get main number frequencies
+            cursor.execute(NUMBER_FREQUENCIES_SQL, (lottery_type,))
+        else:
+            # Get special ball frequencies (position 6)
+            cursor.execute(SPECIAL_BALL_FREQUENCIES_SQL, (lottery_type,))
+        
+        return NUMBER_FREQUENCIES_ADAPTER.dump_json([
+            NumberFrequencyResponse.model_construct(number=number, count=frequency, percentage=percentage)
+            for number, frequency, percentage in cursor
+        ])
+
+@lru_cache(maxsize=32)
+def position_frequencies_json(lottery_type: str, position: Optional[int]) -> bytes:
+    """Get the serialized position frequencies for a lottery, optionally for a single position."""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        if position:
+            cursor.execute(POSITION_FREQUENCIES_BY_POSITION_SQL, (lottery_type, position))
+        else:
+            cursor.execute(POSITION_FREQUENCIES_SQL, (lottery_type,))
+        
+        return POSITION_FREQUENCIES_ADAPTER.dump_json([
+            PositionFrequencyResponse.model_construct(
+                position=row_position, number=number, count=frequency, percentage=percentage
+            )
+            for row_position, number, frequency, percentage in cursor
+        ])
+
+def latest_combinations_json(lottery_type: str, page: int, page_size: int) -> bytes:
+    """Get one serialized page of the latest winning combinations."""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        
+        # Get total count
+        cursor.execute(DRAW_COUNT_SQL, (lottery_type,))
+        total_count = cursor.fetchone()[0]
+        
+        # Calculate pagination
+        offset = (page - 1) * page_size
+        
+        # Get paginated results
+        cursor.execute(LATEST_DRAWS_SQL, (lottery_type, page_size, offset))
+        
+        # Main numbers are stored pre-split and sorted in n1..n5, so rows need no parsing
+        combinations = [
+            WinningCombination(draw_date=row[0], main_numbers=list(row[1:6]), special_ball=row[6])
+            for row in cursor
+        ]
+        
+        return LATEST_COMBINATIONS_ADAPTER.dump_json(WinningCombinationsResponse(
+            combinations=combinations,
+            total_count=total_count,
+            has_more=(offset + page_size < total_count)
+        ))
+
+@lru_cache(maxsize=64)
+def latest_first_page_json(lottery_type: str, page_size: int) -> bytes:
+    """Get the serialized first page of the latest winning combinations."""
+    return latest_combinations_json(lottery_type, 1, page_size)
+
+def json_response(request: Request, body: bytes) -> Response:
+    """Return a JSON body with an ETag, or 304 Not Modified if the client already has that body."""
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [
+        tag.strip().removeprefix('W/') for tag in if_none_match.split(',')
+    ]):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Lottery Stats API"}
 
 @app.get("/{lottery_type}/number-frequencies", response_model=List[NumberFrequencyResponse])
-async def get_number_frequencies(
+def get_number_frequencies(
+    request: Request,
     lottery_type: LotteryType,
     category: str = Query(..., description="Either 'main' for main numbers or 'special' for Mega Ball/Powerball")
 ):
     """Get frequency statistics for all numbers in a lottery."""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        if category == 'main':
-            # Get main number frequencies
-            cursor.execute('''
-                SELECT number, frequency, percentage
-                FROM number_frequencies
-                WHERE lottery_type = ?
-                ORDER BY number
-            ''', (lottery_type.value,))
-        elif category == 'special':
-            # Get special ball frequencies (position 6)
-            cursor.execute('''
-                SELECT number, frequency, percentage
-                FROM position_frequencies
-                WHERE lottery_type = ? AND position = 6
-                ORDER BY number
-            ''', (lottery_type.value,))
-        else:
+        if category not in ('main', 'special'):
             raise HTTPException(status_code=400, detail="Invalid category. Use 'main' or 'special'")
         
-        results = []
-        for row in cursor.fetchall():
-            results.append(NumberFrequencyResponse(
-                number=row['number'],
-                count=row['frequency'],
-                percentage=row['percentage']
-            ))
-        
-        conn.close()
-        return results
+        refresh_caches()
+        return json_response(request, number_frequencies_json(_LT_VALUE[lottery_type], category))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/{lottery_type}/position-frequencies", response_model=List[PositionFrequencyResponse])
-async def get_position_frequencies(
+def get_position_frequencies(
+    request: Request,
     lottery_type: LotteryType,
     position: Optional[int] = Query(None, ge=1, le=5, description="Filter by specific position (1-5)")
 ):
     """Get frequency statistics for numbers in each position."""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        query = '''
-            SELECT position, number, frequency, percentage
-            FROM position_frequencies
-            WHERE lottery_type = ? AND position < 6
-        '''
-        params = [lottery_type.value]
-        
-        if position:
-            query += ' AND position = ?'
-            params.append(position)
-            
-        query += ' ORDER BY position, number'
-        
-        cursor.execute(query, params)
-        
-        results = []
-        for row in cursor.fetchall():
-            results.append(PositionFrequencyResponse(
-                position=row['position'],
-                number=row['number'],
-                count=row['frequency'],
-                percentage=row['percentage']
-            ))
-        
-        conn.close()
-        return results
+        refresh_caches()
+        return json_response(request, position_frequencies_json(_LT_VALUE[lottery_type], position))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/{lottery_type}/check-combination", response_model=CombinationResponse)
-async def check_combination(lottery_type: LotteryType, request: CombinationRequest):
+def check_combination(lottery_type: LotteryType, request: CombinationRequest):
     """Check if a combination exists in historical data."""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Convert numbers to string format for comparison
-        main_numbers_str = ' '.join(map(str, sorted(request.numbers)))
-        
-        # Find matches based on main numbers
-        cursor.execute('''
-            SELECT draw_date, winning_numbers, special_ball
-            FROM draws
-            WHERE lottery_type = ? AND winning_numbers = ?
-            ORDER BY draw_date DESC
-        ''', (lottery_type.value, main_numbers_str))
-        
-        matches = cursor.fetchall()
-        
-        if not matches:
-            conn.close()
-            return CombinationResponse(
-                exists=False,
-                frequency=0,
-                dates=[],
-                main_numbers=sorted(request.numbers),
-                special_ball=request.special_ball
-            )
-        
-        # Convert matches to response format
-        matches_list = []
-        exact_match_found = False
-        
-        for row in matches:
-            row_special_ball = row['special_ball']
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            # Sort once and pack the numbers into the 5-byte key used for comparison
+            sorted_numbers = sorted(request.numbers)
+            
+            # Find matches based on main numbers; numbers that cannot be packed into the key were never drawn
+            matches = []
+            if 0 <= sorted_numbers[0] and sorted_numbers[-1] <= MAX_KEY_NUMBER:
+                cursor.execute(MATCHING_DRAWS_SQL, (_LT_VALUE[lottery_type], numbers_key(sorted_numbers)))
+                matches = cursor.fetchall()
+            
+            if not matches:
+                return CombinationResponse(
+                    exists=False,
+                    frequency=0,
+                    dates=[],
+                    main_numbers=sorted_numbers,
+                    special_ball=request.special_ball
+                )
+            
+            # Convert matches to response format
+            matches_list = []
+            exact_match_found = False
+            
+            for draw_date, row_special_ball in matches:
+                # If special ball is provided, mark if we found an exact match
+                if request.special_ball is not None and row_special_ball == request.special_ball:
+                    exact_match_found = True
+                    
+                matches_list.append({
+                    'date': draw_date,
+                    'special_ball': row_special_ball,
+                    'prize': None  # Prize info not currently stored
+                })
+            
+            # If special ball was provided but no exact match was found, return no matches
+            if request.special_ball is not None and not exact_match_found:
+                return CombinationResponse(
+                    exists=False,
+                    frequency=0,
+                    dates=[],
+                    main_numbers=sorted_numbers,
+                    special_ball=request.special_ball
+                )
             
-            # If special ball is provided, mark if we found an exact match
-            if request.special_ball is not None and row_special_ball == request.special_ball:
-                exact_match_found = True
-                
-            matches_list.append({
-                'date': row['draw_date'],
-                'special_ball': row_special_ball,
-                'prize': None  # Prize info not currently stored
-            })
-        
-        conn.close()
-        
-        # If special ball was provided but no exact match was found, return no matches
-        if request.special_ball is not None and not exact_match_found:
             return CombinationResponse(
-                exists=False,
-                frequency=0,
-                dates=[],
-                main_numbers=sorted(request.numbers),
-                special_ball=request.special_ball
+                exists=True,
+                frequency=len(matches_list),
+                dates=[match['date'] for match in matches_list],
+                main_numbers=sorted_numbers,
+                special_ball=request.special_ball,
+                matches=matches_list
             )
-        
-        return CombinationResponse(
-            exists=True,
-            frequency=len(matches_list),
-            dates=[match['date'] for match in matches_list],
-            main_numbers=sorted(request.numbers),
-            special_ball=request.special_ball,
-            matches=matches_list
-        )
-        
+            
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/{lottery_type}/generate-optimized", response_model=GeneratedCombinationResponse)
-async def generate_optimized_combination(lottery_type: LotteryType):
+def generate_optimized_combination(lottery_type: LotteryType):
     """Generate a combination that maximizes position-specific frequencies while ensuring it's unique."""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Get the maximum range for numbers based on lottery type
-        max_main = 70 if lottery_type == LotteryType.mega_millions else 69
-        max_special = 25 if lottery_type == LotteryType.mega_millions else 26
-        
-        # Get highest frequency numbers for each position
-        optimized_numbers = []
-        position_percentages = {}
-        
-        for position in range(1, 6):
-            cursor.execute('''
-                SELECT number, percentage
-                FROM position_frequencies
-                WHERE lottery_type = ? AND position = ?
-                ORDER BY frequency DESC
-            ''', (lottery_type.value, position))
+        with get_db() as conn:
+            cursor = conn.cursor()
             
-            # Find the highest frequency number that isn't already selected
-            for row in cursor.fetchall():
-                if row['number'] not in optimized_numbers and 1 <= row['number'] <= max_main:
-                    optimized_numbers.append(row['number'])
-                    position_percentages[position] = row['percentage']
-                    break
-        
-        # Get highest frequency special ball
-        cursor.execute('''
-            SELECT number
-            FROM position_frequencies
-            WHERE lottery_type = ? AND position = 6
-            ORDER BY frequency DESC
-            LIMIT 1
-        ''', (lottery_type.value,))
-        special_ball = cursor.fetchone()['number']
-        
-        # Check if combination exists
-        main_numbers_str = ' '.join(map(str, sorted(optimized_numbers)))
-        cursor.execute('''
-            SELECT COUNT(*) as count
-            FROM draws
-            WHERE lottery_type = ? AND winning_numbers = ? AND special_ball = ?
-        ''', (lottery_type.value, main_numbers_str, special_ball))
-        
-        is_unique = cursor.fetchone()['count'] == 0
-        
-        # If not unique, try modifying the combination
-        if not is_unique:
-            # Try replacing the last number
-            original_last = optimized_numbers[-1]
-            for num in range(1, max_main + 1):
-                if num not in optimized_numbers:
-                    optimized_numbers[-1] = num
-                    main_numbers_str = ' '.join(map(str, sorted(optimized_numbers)))
-                    cursor.execute('''
-                        SELECT COUNT(*) as count
-                        FROM draws
-                        WHERE lottery_type = ? AND winning_numbers = ? AND special_ball = ?
-                    ''', (lottery_type.value, main_numbers_str, special_ball))
-                    if cursor.fetchone()['count'] == 0:
-                        is_unique = True
+            # Get the maximum range for numbers based on lottery type
+            max_main, max_special = LOTTERY_PARAMS[lottery_type]
+            lottery = _LT_VALUE[lottery_type]
+            
+            # Get highest frequency numbers for each position
+            optimized_numbers = []
+            position_percentages = {}
+            
+            refresh_caches()
+            rankings = get_position_rankings(cursor, lottery)
+            for position in range(1, 6):
+                # Find the highest frequency number that isn't already selected
+                for number, percentage in rankings[position]:
+                    if number not in optimized_numbers and 1 <= number <= max_main:
+                        optimized_numbers.append(number)
+                        position_percentages[position] = percentage
                         break
             
-            # If still not unique, restore original and try different special ball
+            # Get highest frequency special ball
+            special_ball = rankings[6][0][0]
+            
+            # Check if combination exists
+            sorted_numbers = sorted(optimized_numbers)
+            main_numbers_key = numbers_key(sorted_numbers)
+            cursor.execute(COMBINATION_COUNT_SQL, (lottery, main_numbers_key, special_ball))
+            
+            is_unique = cursor.fetchone()[0] == 0
+            
+            # If not unique, try modifying the combination
             if not is_unique:
-                optimized_numbers[-1] = original_last
-                for num in range(1, max_special + 1):
-                    if num != special_ball:
-                        cursor.execute('''
-                            SELECT COUNT(*) as count
-                            FROM draws
-                            WHERE lottery_type = ? AND winning_numbers = ? AND special_ball = ?
-                        ''', (lottery_type.value, main_numbers_str, num))
-                        if cursor.fetchone()['count'] == 0:
+                # Try replacing the last number; the other four stay sorted, so each candidate is one insort
+                original_last = optimized_numbers[-1]
+                sorted_prefix = sorted(optimized_numbers[:-1])
+                candidates = []
+                for num in range(1, max_main + 1):
+                    if num not in sorted_prefix and num != original_last:
+                        candidate = sorted_prefix.copy()
+                        bisect.insort(candidate, num)
+                        candidates.append((num, candidate, numbers_key(candidate)))
+                
+                # Check every replacement with a single query and take the first one not already drawn
+                placeholders = ', '.join(['?'] * len(candidates))
+                cursor.execute(
+                    TAKEN_REPLACEMENTS_SQL.format(placeholders=placeholders),
+                    (lottery, special_ball, *(candidate_key for _, _, candidate_key in candidates))
+                )
+                taken = {row[0] for row in cursor}
+                for num, candidate, candidate_key in candidates:
+                    if candidate_key not in taken:
+                        optimized_numbers[-1] = num
+                        sorted_numbers = candidate
+                        is_unique = True
+                        break
+                
+                # If still not unique, keep the original numbers and try different special ball
+                if not is_unique:
+                    cursor.execute(TAKEN_SPECIAL_BALLS_SQL, (lottery, main_numbers_key))
+                    taken = {row[0] for row in cursor}
+                    for num in range(1, max_special + 1):
+                        if num != special_ball and num not in taken:
                             special_ball = num
                             is_unique = True
                             break
-        
-        conn.close()
-        return GeneratedCombinationResponse(
-            main_numbers=sorted(optimized_numbers),
-            special_ball=special_ball,
-            position_percentages=position_percentages,
-            is_unique=is_unique
-        )
-        
+            
+            return GeneratedCombinationResponse(
+                main_numbers=sorted_numbers,
+                special_ball=special_ball,
+                position_percentages=position_percentages,
+                is_unique=is_unique
+            )
+            
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/{lottery_type}/generate-random", response_model=GeneratedCombinationResponse)
-async def generate_random_combination(lottery_type: LotteryType):
+def generate_random_combination(lottery_type: LotteryType):
     """Generate a random combination that hasn't appeared before."""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Get the maximum range for numbers based on lottery type
-        max_main = 70 if lottery_type == LotteryType.mega_millions else 69
-        max_special = 25 if lottery_type == LotteryType.mega_millions else 26
-        
-        # Generate combinations until we find a unique one
-        max_attempts = 100  # Prevent infinite loop
-        for _ in range(max_attempts):
-            # Generate 5 unique random numbers for main numbers
-            main_numbers = sorted(random.sample(range(1, max_main + 1), 5))
-            special_ball = random.randint(1, max_special)
+        with get_db() as conn:
+            cursor = conn.cursor()
             
-            # Check if this combination exists
-            main_numbers_str = ' '.join(map(str, main_numbers))
-            cursor.execute('''
-                SELECT COUNT(*) as count
-                FROM draws
-                WHERE lottery_type = ? AND winning_numbers = ? AND special_ball = ?
-            ''', (lottery_type.value, main_numbers_str, special_ball))
+            # Get the maximum range for numbers based on lottery type
+            max_main, max_special = LOTTERY_PARAMS[lottery_type]
+            lottery = _LT_VALUE[lottery_type]
+            
+            # Generate every candidate up front and check them all with a single query
+            candidates = []
+            for _ in range(RANDOM_ATTEMPTS):
+                # Generate 5 unique random numbers for main numbers
+                main_numbers = sorted(random.sample(range(1, max_main + 1), 5))
+                special_ball = random.randint(1, max_special)
+                candidates.append((numbers_key(main_numbers), main_numbers, special_ball))
+            
+            params = []
+            for main_numbers_key, _, special_ball in candidates:
+                params.extend((main_numbers_key, special_ball))
+            params.append(lottery)
+            cursor.execute(EXISTING_CANDIDATES_SQL, params)
+            existing = set(cursor)
+            
+            for main_numbers_key, main_numbers, special_ball in candidates:
+                if (main_numbers_key, special_ball) not in existing:
+                    return GeneratedCombinationResponse(
+                        main_numbers=main_numbers,
+                        special_ball=special_ball,
+                        is_unique=True
+                    )
+            
+            raise HTTPException(
+                status_code=500,
+                detail="Could not generate a unique combination after maximum attempts"
+            )
             
-            if cursor.fetchone()['count'] == 0:
-                conn.close()
-                return GeneratedCombinationResponse(
-                    main_numbers=main_numbers,
-                    special_ball=special_ball,
-                    is_unique=True
-                )
-        
-        conn.close()
-        raise HTTPException(
-            status_code=500,
-            detail="Could not generate a unique combination after maximum attempts"
-        )
-        
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/{lottery_type}/latest-combinations", response_model=WinningCombinationsResponse)
-async def get_latest_combinations(
+def get_latest_combinations(
+    request: Request,
     lottery_type: LotteryType,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=50, description="Number of combinations per page")
 ):
     """Get the latest winning combinations with pagination support."""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Get total count
-        cursor.execute(
-            'SELECT COUNT(*) as count FROM draws WHERE lottery_type = ?',
-            (lottery_type.value,)
-        )
-        total_count = cursor.fetchone()['count']
-        
-        # Calculate pagination
-        offset = (page - 1) * page_size
-        
-        # Get paginated results
-        cursor.execute('''
-            SELECT draw_date, winning_numbers, special_ball
-            FROM draws
-            WHERE lottery_type = ?
-            ORDER BY draw_date DESC
-            LIMIT ? OFFSET ?
-        ''', (lottery_type.value, page_size, offset))
-        
-        combinations = []
-        for row in cursor.fetchall():
-            main_numbers = [int(n) for n in row['winning_numbers'].split()]
-            combinations.append(WinningCombination(
-                draw_date=row['draw_date'],
-                main_numbers=sorted(main_numbers),
-                special_ball=row['special_ball']
-            ))
-        
-        conn.close()
-        return WinningCombinationsResponse(
-            combinations=combinations,
-            total_count=total_count,
-            has_more=(offset + page_size < total_count)
-        )
+        refresh_caches()
+        if page == 1:
+            # The first page is by far the most requested, so its serialized body is cached
+            body = latest_first_page_json(_LT_VALUE[lottery_type], page_size)
+        else:
+            body = latest_combinations_json(_LT_VALUE[lottery_type], page, page_size)
+        return json_response(request, body)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,34 +1,53 @@
 #!/usr/bin/env python3
 import sqlite3
 import pandas as pd
+import numpy as np
 import os
 from pathlib import Path
+from itertools import repeat
+from typing import List, Tuple
+from src.collection.schema import (
+    NUMBER_COLUMNS, connect_for_writes, create_draws_table, migrate_draws, ensure_unique_draws,
+    create_position_top_numbers, refresh_position_top_numbers
+)
 
 # Constants
 DATA_DIR = Path(__file__).parent.parent.parent / 'data' / 'raw'
 ANALYSIS_DIR = Path(__file__).parent.parent.parent / 'data' / 'analysis'
 DB_PATH = Path(__file__).parent.parent.parent / 'data' / 'lottery.db'
+CSV_CHUNK_ROWS = 100_000  # Draws parsed and inserted per chunk, bounding memory on large CSVs
+DRAW_DATE_FORMAT = '%m/%d/%Y'  # 'Draw Date' format in the raw CSVs
+DRAW_COLUMNS = [
+    'lottery_type', 'draw_date', 'winning_numbers', 'special_ball', 'multiplier', *NUMBER_COLUMNS, 'winning_numbers_blob'
+]
+INSERT_DRAW_SQL = f'''
+    INSERT OR IGNORE INTO draws ({', '.join(DRAW_COLUMNS)})
+    VALUES ({', '.join(['?'] * len(DRAW_COLUMNS))})
+'''
 
 def create_database():
     """Create the SQLite database and tables if they don't exist."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_for_writes(DB_PATH)
     cursor = conn.cursor()
     
     # Create the draws table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS draws (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        lottery_type TEXT NOT NULL,
-        draw_date DATE NOT NULL,
-        winning_numbers TEXT NOT NULL,
-        special_ball INTEGER NOT NULL,
-        multiplier INTEGER NOT NULL DEFAULT 1
-    )
-    ''')
+    create_draws_table(conn)
+    
+    # Bring older tables up to date and enforce one row per (lottery_type, draw_date)
+    migrate_draws(conn)
+    removed = ensure_unique_draws(conn)
+    if removed:
+        print(f"Removed {removed} duplicate draw rows")
     
     # Create indices
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_draw_date ON draws (draw_date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_winning_numbers ON draws (winning_numbers)')
+    # Combination lookups go through idx_draws_combo_blob; nothing filters on the text column any more
+    cursor.execute('DROP INDEX IF EXISTS idx_winning_numbers')
+    # ux_draws serves (lottery_type, draw_date) lookups and date ordering
+    cursor.execute('DROP INDEX IF EXISTS idx_draws_lottery_date')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_draws_combo_blob ON draws (lottery_type, winning_numbers_blob, special_ball, draw_date)'
+    )
     
     # Create frequency tables
     cursor.execute('''
@@ -52,56 +71,81 @@ def create_database():
     )
     ''')
     
+    create_position_top_numbers(conn)
+    
     conn.commit()
     return conn
 
+def draw_records(df: pd.DataFrame, lottery_type: str, special_ball_column: str) -> List[Tuple]:
+    """Convert a chunk of CSV draws into executemany rows in DRAW_COLUMNS order."""
+    # Convert whole columns at once: ISO dates for SQLite, and multipliers defaulting to 1 when missing or invalid
+    dates = df['Draw Date'].dt.strftime('%Y-%m-%d')
+    special_balls = df[special_ball_column].astype('int64')
+    if 'Multiplier' in df.columns:
+        # Take the digits from values like '2', '2.0' or '2X'; anything without digits becomes <NA> and then 1
+        multipliers = (
+            df['Multiplier'].astype('string').str.extract(r'(\d+)', expand=False)
+            .astype('Int64').fillna(1).astype('int64')
+        )
+    else:
+        multipliers = pd.Series(1, index=df.index)
+    
+    # Main numbers sorted per row; each uint8 row doubles as the 5-byte winning_numbers_blob key
+    numbers = df['Winning Numbers'].str.split(expand=True).iloc[:, :len(NUMBER_COLUMNS)].astype(np.uint8).to_numpy()
+    numbers.sort(axis=1)
+    
+    return list(zip(
+        repeat(lottery_type),
+        dates.tolist(),
+        df['Winning Numbers'].tolist(),
+        special_balls.tolist(),
+        multipliers.tolist(),
+        *numbers.T.tolist(),
+        map(bytes, numbers)
+    ))
+
 def import_csv_to_db(csv_path: Path, lottery_type: str, conn: sqlite3.Connection):
     """Import data from CSV file into the database."""
     print(f"Importing {lottery_type} data from {csv_path}")
     
-    # Read CSV file
-    df = pd.read_csv(csv_path)
-    
-    # Convert data to the format we need
-    records = []
-    
     # Define column names based on lottery type
     if lottery_type == 'mega_millions':
         special_ball_column = 'Mega Ball'
     else:  # powerball
         special_ball_column = 'Powerball Ball'
     
-    for _, row in df.iterrows():
-        # Convert draw date to ISO format for SQLite
-        draw_date = pd.to_datetime(row['Draw Date']).strftime('%Y-%m-%d')
-        
-        # Convert multiplier to int, default to 1 if not present or invalid
-        try:
-            multiplier = int(row.get('Multiplier', 1))
-        except (ValueError, TypeError):
-            multiplier = 1
-        
-        records.append((
-            lottery_type,
-            draw_date,
-            row['Winning Numbers'],
-            int(row[special_ball_column]),
-            multiplier
-        ))
-    
-    # Insert records in batches
-    cursor = conn.cursor()
-    cursor.executemany(
-        'INSERT INTO draws (lottery_type, draw_date, winning_numbers, special_ball, multiplier) VALUES (?, ?, ?, ?, ?)',
-        records
+    # Let the C parser skip unused columns, type the special ball and parse dates; stream large files in chunks
+    columns = {'Draw Date', 'Winning Numbers', special_ball_column, 'Multiplier'}
+    chunks = pd.read_csv(
+        csv_path,
+        usecols=lambda column: column in columns,
+        dtype={special_ball_column: 'int32', 'Winning Numbers': str},
+        parse_dates=['Draw Date'],
+        date_format=DRAW_DATE_FORMAT,
+        engine='c',
+        chunksize=CSV_CHUNK_ROWS
     )
+    
+    # Insert every chunk inside one explicit transaction; draws already stored are skipped
+    imported = 0
+    conn.execute('BEGIN')
+    for chunk in chunks:
+        records = draw_records(chunk, lottery_type, special_ball_column)
+        imported += conn.executemany(INSERT_DRAW_SQL, records).rowcount
     conn.commit()
-    print(f"Imported {len(records)} records for {lottery_type}")
+    print(f"Imported {imported} records for {lottery_type}")
+
+def column_records(df: pd.DataFrame, columns: List[str]) -> List[Tuple]:
+    """Build executemany rows by zipping whole columns converted to Python values in one pass each."""
+    return list(zip(*(df[column].tolist() for column in columns)))
 
 def import_frequencies(conn: sqlite3.Connection):
     """Import frequency data from analysis CSVs."""
     cursor = conn.cursor()
     
+    # Replace the frequency data in one explicit transaction
+    cursor.execute('BEGIN')
+    
     # Clear existing frequency data
     cursor.execute('DELETE FROM position_frequencies')
     cursor.execute('DELETE FROM number_frequencies')
@@ -110,20 +154,16 @@ def import_frequencies(conn: sqlite3.Connection):
     position_file = ANALYSIS_DIR / 'position_frequencies.csv'
     if position_file.exists():
         print("\nImporting position frequencies...")
-        df = pd.read_csv(position_file)
+        df = pd.read_csv(
+            position_file,
+            usecols=['Lottery', 'Position', 'Number', 'Count', 'Percentage'],
+            dtype={'Lottery': 'category', 'Position': 'int64', 'Number': 'int64', 'Count': 'int64', 'Percentage': 'float64'},
+            engine='c'
+        )
+        # Convert lottery names to match our format; map on a categorical runs once per category and tolerates names that merge
+        df['Lottery'] = df['Lottery'].map(lambda name: name.lower().replace(' ', '_'))
         
-        position_records = []
-        for _, row in df.iterrows():
-            # Convert lottery name to match our format
-            lottery_type = row['Lottery'].lower().replace(' ', '_')
-            
-            position_records.append((
-                lottery_type,
-                row['Position'],
-                row['Number'],
-                row['Count'],
-                row['Percentage']
-            ))
+        position_records = column_records(df, ['Lottery', 'Position', 'Number', 'Count', 'Percentage'])
         
         cursor.executemany(
             'INSERT INTO position_frequencies (lottery_type, position, number, frequency, percentage) VALUES (?, ?, ?, ?, ?)',
@@ -135,20 +175,18 @@ def import_frequencies(conn: sqlite3.Connection):
     number_file = ANALYSIS_DIR / 'number_frequencies.csv'
     if number_file.exists():
         print("\nImporting number frequencies...")
-        df = pd.read_csv(number_file)
+        df = pd.read_csv(
+            number_file,
+            usecols=['Lottery', 'Category', 'Number', 'Count', 'Percentage'],
+            dtype={'Lottery': 'category', 'Category': 'category', 'Number': 'int64', 'Count': 'int64', 'Percentage': 'float64'},
+            engine='c'
+        )
+        # Convert lottery names to match our format; map on a categorical runs once per category and tolerates names that merge
+        df['Lottery'] = df['Lottery'].map(lambda name: name.lower().replace(' ', '_'))
         
-        number_records = []
-        for _, row in df.iterrows():
-            # Convert lottery name to match our format
-            lottery_type = row['Lottery'].lower().replace(' ', '_')
-            
-            if row['Category'] == 'Main Numbers':  # Only import main number frequencies
-                number_records.append((
-                    lottery_type,
-                    row['Number'],
-                    row['Count'],
-                    row['Percentage']
-                ))
+        # Only import main number frequencies
+        main_numbers = df.loc[df['Category'].eq('Main Numbers')]
+        number_records = column_records(main_numbers, ['Lottery', 'Number', 'Count', 'Percentage'])
         
         cursor.executemany(
             'INSERT INTO number_frequencies (lottery_type, number, frequency, percentage) VALUES (?, ?, ?, ?)',
@@ -156,6 +194,7 @@ def import_frequencies(conn: sqlite3.Connection):
         )
         print(f"Imported {len(number_records)} number frequency records")
     
+    refresh_position_top_numbers(conn)
     conn.commit()
 
 def main():
@@ -179,6 +218,9 @@ def main():
         # Import frequency data
         import_frequencies(conn)
         
+        # Gather planner statistics so combination lookups use the key index rather than the date index
+        conn.execute('ANALYZE')
+        
         # Print summary
         cursor = conn.cursor()
         print("\nDatabase Summary:")
@@ -196,6 +238,7 @@ def main():
         for lottery_type, count in cursor.fetchall():
             print(f"Total {lottery_type} number frequencies: {count}")
         
+        conn.execute('PRAGMA optimize')
     finally:
         conn.close()
 
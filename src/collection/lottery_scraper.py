@@ -1,25 +1,51 @@
 #!/usr/bin/env python3
 import requests
 from bs4 import BeautifulSoup
+import soupsieve
 import sqlite3
 from datetime import datetime
 import argparse
 from pathlib import Path
 import time
 import random
-from typing import List, Dict, Optional, Tuple, Literal
+import threading
+from typing import List, Optional, Tuple, Literal
 import logging
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import urllib3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from src.collection.schema import (
+    split_numbers_with_key, create_draws_table, migrate_draws, ensure_unique_draws, connect_for_writes
+)
 
 # Setup logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
 DB_PATH = Path(__file__).parent.parent.parent / 'data' / 'lottery.db'
 BASE_URL = "https://www.lottery.net"
+Draw = Tuple[str, str, int, float]  # (draw_date, winning_numbers, special_ball, multiplier) as scraped
+FETCH_WORKERS = 4  # Year pages requested from the host at once
+REQUEST_SPACING = (1.0, 1.5)  # Seconds between request starts across all workers, picked at random in this range
+MONTHS = {
+    month: index for index, month in enumerate(
+        ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+         'august', 'september', 'october', 'november', 'december'],
+        start=1
+    )
+}  # Lowercase month name -> month number, for parsing draw dates without strptime
+# Precompiled CSS selectors for the parts of a draw row
+DATE_CELL_SELECTOR = soupsieve.compile('td')
+DATE_LINK_SELECTOR = soupsieve.compile('a')
+BALL_SELECTOR = soupsieve.compile('ul.multi.results.mega-millions li')
+INSERT_DRAW_SQL = '''
+    INSERT OR IGNORE INTO draws 
+    (lottery_type, draw_date, winning_numbers, special_ball, multiplier,
+     n1, n2, n3, n4, n5, winning_numbers_blob)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
 
 def create_session_with_retries() -> requests.Session:
     """Create a session with retry strategy."""
@@ -34,7 +60,11 @@ def create_session_with_retries() -> requests.Session:
     )
     
     # Mount the adapter with retry strategy for both HTTP and HTTPS
-    adapter = HTTPAdapter(max_retries=retries)
+    adapter = HTTPAdapter(
+        max_retries=retries,
+        pool_connections=8,  # hosts with a cached connection pool
+        pool_maxsize=16  # kept-alive sockets per host, enough for every concurrent year fetch
+    )
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     
@@ -50,9 +80,15 @@ class LotteryScraper:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
+            'Accept-Encoding': 'gzip, deflate',  # The HTML result tables compress well; requests decompresses transparently
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         }
+        # Set once on the session rather than passed to every request
+        self.session.headers.update(self.headers)
+        # Shared by the fetch workers so the host sees requests spaced out, not one burst per worker
+        self._request_lock = threading.Lock()
+        self._next_request_at = 0.0
 
     def _get_latest_date_from_db(self, conn: sqlite3.Connection) -> Optional[str]:
         """Get the most recent draw date from the database."""
@@ -65,14 +101,15 @@ class LotteryScraper:
         return result
 
     def process_row(self, row):
+        warning = self.logger.warning
         try:
             # Find the date cell
-            date_cell = row.find('td')
+            date_cell = DATE_CELL_SELECTOR.select_one(row)
             if not date_cell:
                 return None
 
             # Get date from link or text
-            date_link = date_cell.find('a')
+            date_link = DATE_LINK_SELECTOR.select_one(date_cell)
             if date_link:
                 date_text = date_link.text.strip()
             else:
@@ -81,34 +118,30 @@ class LotteryScraper:
             # Remove line breaks and extra whitespace
             date_text = ' '.join(date_text.split())
 
-            # Handle date formats
+            # Handle date formats: "Month DD, YYYY", optionally preceded by the day of week
+            date_parts = date_text.replace(',', '').split()
+            if len(date_parts) == 4:  # DayOfWeek Month DD YYYY
+                date_parts = date_parts[1:]
             try:
-                # First try the standard format
-                draw_date = datetime.strptime(date_text, '%B %d, %Y').strftime('%Y-%m-%d')
-            except ValueError:
-                try:
-                    # Try the format with day of week
-                    # Remove day of week from start of string
-                    date_parts = date_text.split(' ')
-                    if len(date_parts) >= 4:  # DayOfWeek Month DD, YYYY
-                        date_text = ' '.join(date_parts[1:])
-                    draw_date = datetime.strptime(date_text, '%B %d, %Y').strftime('%Y-%m-%d')
-                except ValueError as e:
-                    self.logger.warning(f"Could not parse date: {date_text} - {str(e)}")
-                    return None
+                month, day, year = date_parts
+                draw_date = f"{int(year):04d}-{MONTHS[month.lower()]:02d}-{int(day):02d}"
+            except (KeyError, ValueError) as e:
+                warning(f"Could not parse date: {date_text} - {str(e)}")
+                return None
 
-            # Find the numbers list
-            numbers_list = row.find('ul', class_='multi results mega-millions')
-            if not numbers_list:
+            # Find every ball in the numbers list with one selector pass
+            balls = BALL_SELECTOR.select(row)
+            if not balls:
                 return None
 
-            # Get all ball elements
-            regular_balls = []
+            # Get all ball elements; main numbers go into a fixed five-slot list
+            regular_balls = [None] * 5
+            regular_count = 0
             special_ball = None
             multiplier = 1.0
 
             # Process each ball
-            for ball in numbers_list.find_all('li'):
+            for ball in balls:
                 try:
                     number = int(ball.text.strip())
                     if 'mega-ball' in ball.get('class', []):
@@ -116,31 +149,43 @@ class LotteryScraper:
                     elif 'megaplier' in ball.get('class', []):
                         multiplier = float(number)
                     elif 'ball' in ball.get('class', []):
-                        regular_balls.append(str(number))
+                        if regular_count < 5:
+                            regular_balls[regular_count] = str(number)
+                        regular_count += 1
                 except ValueError as e:
-                    self.logger.warning(f"Could not parse ball number: {ball.text} - {str(e)}")
+                    warning(f"Could not parse ball number: {ball.text} - {str(e)}")
                     continue
 
             # Validate we have the correct number of balls
-            if len(regular_balls) != 5 or special_ball is None:
-                self.logger.warning(f"Invalid number of balls: {len(regular_balls)} regular, special: {special_ball}")
+            if regular_count != 5 or special_ball is None:
+                warning(f"Invalid number of balls: {regular_count} regular, special: {special_ball}")
                 return None
 
-            draw = {
-                'draw_date': draw_date,
-                'winning_numbers': ' '.join(regular_balls),
-                'special_ball': special_ball,
-                'multiplier': multiplier
-            }
+            draw = (draw_date, ' '.join(regular_balls), special_ball, multiplier)
 
-            self.logger.debug(f"Successfully extracted draw: {draw}")
+            # Guarded so the message isn't formatted for every row when DEBUG is off
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Successfully extracted draw: {draw}")
             return draw
 
         except Exception as e:
             self.logger.error(f"Error processing row: {str(e)}")
             return None
 
-    def scrape_year(self, year: int, min_date: Optional[datetime] = None) -> List[Dict]:
+    def _collect_draws(self, rows: List, min_date: Optional[str]) -> List[Draw]:
+        """Process draw rows listed newest first, stopping at the first draw before min_date (YYYY-MM-DD)."""
+        data = []
+        for row in rows:
+            row_data = self.process_row(row)
+            if row_data:
+                if min_date and row_data[0] < min_date:
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Date {row_data[0]} is before min_date {min_date}; skipping older draws")
+                    break
+                data.append(row_data)
+        return data
+
+    def scrape_year(self, year: int, min_date: Optional[datetime] = None) -> List[Draw]:
         """Scrape lottery data for a specific year."""
         url = f"https://www.lottery.net/{self.lottery_type}/numbers/{year}"
         logger.info(f"Fetching URL: {url}")
@@ -148,41 +193,33 @@ class LotteryScraper:
         try:
             # Try with SSL verification first
             try:
-                response = self.session.get(url, headers=self.headers, timeout=30)
+                response = self.session.get(url, timeout=30)
                 response.raise_for_status()
             except (requests.exceptions.SSLError, urllib3.exceptions.SSLError):
                 logger.warning(f"SSL verification failed for {year}, retrying without SSL verification...")
                 # If SSL fails, try without verification
-                response = self.session.get(url, headers=self.headers, verify=False, timeout=30)
+                response = self.session.get(url, verify=False, timeout=30)
                 response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # lxml's C parser is much faster than html.parser; raw bytes let it skip the text decode
+            soup = BeautifulSoup(response.content, 'lxml')
             data = []
             
+            # ISO date strings compare in date order, so rows are checked without parsing their dates back
+            min_date_text = min_date.strftime('%Y-%m-%d') if min_date else None
+            
             # Try new format first (post-2021)
             draw_rows = soup.find_all('tr', class_='draw')
             if draw_rows:
                 logger.info(f"Found {len(draw_rows)} potential draws for {year}")
-                for row in draw_rows:
-                    row_data = self.process_row(row)
-                    if row_data:
-                        if min_date and datetime.strptime(row_data['draw_date'], '%Y-%m-%d') < min_date:
-                            logger.debug(f"Date {row_data['draw_date']} is before min_date {min_date}")
-                            continue
-                        data.append(row_data)
+                data = self._collect_draws(draw_rows, min_date_text)
             else:
                 # Try old format (pre-2021)
                 table = soup.find('table')
                 if table:
                     rows = table.find_all('tr')[1:]  # Skip header row
                     logger.info(f"Found {len(rows)} potential draws in old format for {year}")
-                    for row in rows:
-                        row_data = self.process_row(row)
-                        if row_data:
-                            if min_date and datetime.strptime(row_data['draw_date'], '%Y-%m-%d') < min_date:
-                                logger.debug(f"Date {row_data['draw_date']} is before min_date {min_date}")
-                                continue
-                            data.append(row_data)
+                    data = self._collect_draws(rows, min_date_text)
             
             logger.info(f"Successfully collected {len(data)} records for {year}")
             return data
@@ -195,32 +232,37 @@ class LotteryScraper:
             logger.error(f"Unexpected error for {year}: {str(e)}")
             return []
 
-    def _insert_draw(self, conn: sqlite3.Connection, draw_data: Dict) -> bool:
-        """Insert a single draw into the database."""
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR IGNORE INTO draws 
-                (lottery_type, draw_date, winning_numbers, special_ball, multiplier)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                self.lottery_type,
-                draw_data['draw_date'],
-                draw_data['winning_numbers'],
-                draw_data['special_ball'],
-                draw_data['multiplier']
-            ))
-            return cursor.rowcount > 0
-        except sqlite3.Error as e:
-            logger.error(f"Database error: {e}")
-            return False
+    def _wait_for_request_slot(self):
+        """Block until the previous request start, on any worker, is at least REQUEST_SPACING behind."""
+        with self._request_lock:
+            now = time.monotonic()
+            start = max(now, self._next_request_at)
+            self._next_request_at = start + random.uniform(*REQUEST_SPACING)
+        time.sleep(start - now)
+
+    def _fetch_year(self, year: int, min_date: Optional[datetime] = None) -> List[Draw]:
+        """Scrape one year on a worker thread once a request slot is free, to stay polite to the host."""
+        self._wait_for_request_slot()
+        return self.scrape_year(year, min_date)
+
+    def _draw_record(self, draw: Draw) -> Tuple:
+        """Build the draws row for a scraped draw."""
+        return (self.lottery_type, *draw, *split_numbers_with_key(draw[1]))
+
+    def _insert_draws(self, cursor: sqlite3.Cursor, draws: List[Draw]) -> int:
+        """Insert a batch of draws with one executemany and return how many were new."""
+        changes_before = cursor.connection.total_changes
+        cursor.executemany(INSERT_DRAW_SQL, [self._draw_record(draw) for draw in draws])
+        return cursor.connection.total_changes - changes_before
 
     def scrape_and_update(self, start_date: Optional[str] = None) -> int:
         """
         Scrape lottery data and update the database.
         Returns the number of new records added.
         """
-        conn = sqlite3.connect(DB_PATH)
+        # Autocommit mode: the BEGIN/COMMIT pairs below are the only transactions, run on one reused cursor
+        conn = connect_for_writes(DB_PATH, isolation_level=None)
+        cursor = conn.cursor()
         try:
             if not start_date:
                 start_date = self._get_latest_date_from_db(conn)
@@ -233,19 +275,22 @@ class LotteryScraper:
             
             new_records = 0
             
-            # Scrape each year from start_year to current_year
-            for year in range(current_year, start_year - 1, -1):
-                year_data = self.scrape_year(year, min_date)
-                
-                for draw_data in year_data:
-                    if self._insert_draw(conn, draw_data):
-                        new_records += 1
-                
-                # Random delay between years
-                if year > start_year:
-                    time.sleep(random.uniform(1, 3))
+            # Fetch the years from start_year to current_year concurrently; rows are written here as each year arrives
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+                futures = [
+                    executor.submit(self._fetch_year, year, min_date)
+                    for year in range(current_year, start_year - 1, -1)
+                ]
+                for future in as_completed(futures):
+                    year_data = future.result()
+                    
+                    # One short write transaction per year, so the database isn't locked across HTTP requests
+                    cursor.execute('BEGIN IMMEDIATE')
+                    new_records += self._insert_draws(cursor, year_data)
+                    cursor.execute('COMMIT')
 
-            conn.commit()
+            # Refresh planner statistics for the next incremental run's MAX(draw_date) and combination lookups
+            cursor.execute('PRAGMA optimize')
             logger.info(f"Added {new_records} new records to the database")
             return new_records
 
@@ -263,23 +308,22 @@ def main():
                       help='Type of lottery to scrape')
     parser.add_argument('--start-date', type=str,
                       help='Optional: Start date in YYYY-MM-DD format. If not provided, uses latest date from database')
+    parser.add_argument('--debug', action='store_true',
+                      help='Optional: Log every extracted draw')
     
     args = parser.parse_args()
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
     
     # Ensure database and tables exist
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_for_writes(DB_PATH)
     try:
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS draws (
-                lottery_type TEXT,
-                draw_date TEXT,
-                winning_numbers TEXT,
-                special_ball INTEGER,
-                multiplier REAL,
-                PRIMARY KEY (lottery_type, draw_date)
-            )
-        ''')
+        create_draws_table(conn)
         conn.commit()
+        migrate_draws(conn)
+        removed = ensure_unique_draws(conn)
+        if removed:
+            logger.info(f"Removed {removed} duplicate draw rows")
     finally:
         conn.close()
     
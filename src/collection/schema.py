@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Constants
+NUMBER_COLUMNS = ['n1', 'n2', 'n3', 'n4', 'n5']  # Main numbers in ascending order
+POSITION_TOP_NUMBERS = 10  # Ranked numbers kept per position in position_top_numbers
+WRITE_PRAGMAS = [
+    'PRAGMA page_size = 4096',  # Only takes effect on a new database, so it must run before anything is written
+    'PRAGMA journal_mode = WAL',  # Readers keep working while a batch is written
+    'PRAGMA synchronous = NORMAL',  # Safe under WAL and skips an fsync per commit
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -64000',  # ~64MB page cache
+    'PRAGMA mmap_size = 268435456',  # Read hot pages through a 256MB memory map instead of read() calls
+]
+
+def connect_for_writes(db_path: Path, isolation_level: Optional[str] = '') -> sqlite3.Connection:
+    """Open a database connection tuned for batched inserts; isolation_level=None leaves transactions to the caller."""
+    conn = sqlite3.connect(db_path, isolation_level=isolation_level)
+    for pragma in WRITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def split_numbers(winning_numbers: str) -> List[int]:
+    """Parse a winning numbers string into its main numbers in ascending order."""
+    # Powerball strings carry the special ball as a sixth number, which is stored separately
+    return sorted(int(n) for n in winning_numbers.split()[:len(NUMBER_COLUMNS)])
+
+def numbers_key(numbers: List[int]) -> bytes:
+    """Pack main numbers into the fixed 5-byte key stored in winning_numbers_blob."""
+    return bytes(sorted(numbers))
+
+def split_numbers_with_key(winning_numbers: str) -> Tuple:
+    """Parse a winning numbers string into its sorted main numbers followed by their 5-byte key."""
+    numbers = split_numbers(winning_numbers)
+    return (*numbers, numbers_key(numbers))
+
+def create_draws_table(conn: sqlite3.Connection):
+    """Create the draws table shared by the CSV importer and the scraper."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS draws (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lottery_type TEXT NOT NULL,
+            draw_date DATE NOT NULL,
+            winning_numbers TEXT NOT NULL,
+            special_ball INTEGER NOT NULL,
+            multiplier INTEGER NOT NULL DEFAULT 1,
+            n1 INTEGER,
+            n2 INTEGER,
+            n3 INTEGER,
+            n4 INTEGER,
+            n5 INTEGER,
+            winning_numbers_blob BLOB
+        )
+    ''')
+
+def migrate_draws(conn: sqlite3.Connection):
+    """Bring an existing draws table up to date by adding and backfilling the per-number and key columns."""
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(draws)')}
+    if not existing:
+        return
+    
+    for column in NUMBER_COLUMNS:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE draws ADD COLUMN {column} INTEGER')
+    if 'winning_numbers_blob' not in existing:
+        conn.execute('ALTER TABLE draws ADD COLUMN winning_numbers_blob BLOB')
+    
+    rows = conn.execute(
+        'SELECT rowid, winning_numbers FROM draws WHERE n1 IS NULL OR winning_numbers_blob IS NULL'
+    ).fetchall()
+    conn.executemany(
+        'UPDATE draws SET n1 = ?, n2 = ?, n3 = ?, n4 = ?, n5 = ?, winning_numbers_blob = ? WHERE rowid = ?',
+        [(*split_numbers_with_key(winning_numbers), rowid) for rowid, winning_numbers in rows]
+    )
+    conn.commit()
+
+def ensure_unique_draws(conn: sqlite3.Connection) -> int:
+    """Remove repeated copies of a draw and create the ux_draws unique index; return how many rows were removed.
+
+    Raises ValueError without changing anything if copies of a draw disagree on its results.
+    """
+    indexes = {row[1] for row in conn.execute('PRAGMA index_list(draws)')}
+    if 'ux_draws' in indexes:
+        return 0
+    
+    conflicts = conn.execute('''
+        SELECT lottery_type, draw_date
+        FROM draws
+        GROUP BY lottery_type, draw_date
+        HAVING COUNT(DISTINCT winning_numbers) > 1
+            OR COUNT(DISTINCT special_ball) > 1
+            OR COUNT(DISTINCT multiplier) > 1
+    ''').fetchall()
+    if conflicts:
+        draws = ', '.join(f'{lottery_type} {draw_date}' for lottery_type, draw_date in conflicts)
+        raise ValueError(f"Conflicting copies of {len(conflicts)} draws must be resolved by hand: {draws}")
+    
+    # Every remaining copy matches the first one, so only exact repeats are dropped
+    removed = conn.execute('''
+        DELETE FROM draws
+        WHERE rowid NOT IN (SELECT MIN(rowid) FROM draws GROUP BY lottery_type, draw_date)
+    ''').rowcount
+    conn.execute('CREATE UNIQUE INDEX ux_draws ON draws (lottery_type, draw_date)')
+    conn.commit()
+    return removed
+
+def check_draws_schema(conn: sqlite3.Connection):
+    """Raise RuntimeError if an existing draws table predates the columns and unique index the API reads."""
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(draws)')}
+    if not existing:
+        return
+    missing = [column for column in [*NUMBER_COLUMNS, 'winning_numbers_blob'] if column not in existing]
+    if 'ux_draws' not in {row[1] for row in conn.execute('PRAGMA index_list(draws)')}:
+        missing.append('ux_draws')
+    if missing:
+        raise RuntimeError(
+            f"draws table is missing {', '.join(missing)}; run src/collection/import_to_db.py to migrate it"
+        )
+
+def create_position_top_numbers(conn: sqlite3.Connection):
+    """Create the table holding each position's most frequent numbers in rank order."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS position_top_numbers (
+            lottery_type TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            number INTEGER NOT NULL,
+            percentage REAL NOT NULL,
+            PRIMARY KEY (lottery_type, position, rank)
+        )
+    ''')
+
+def refresh_position_top_numbers(conn: sqlite3.Connection, lottery_type: Optional[str] = None):
+    """Rebuild the top-number rankings from position_frequencies for one lottery type, or all of them."""
+    create_position_top_numbers(conn)
+    where = 'WHERE lottery_type = ?' if lottery_type else ''
+    params = (lottery_type,) if lottery_type else ()
+    conn.execute(f'DELETE FROM position_top_numbers {where}', params)
+    conn.execute(f'''
+        INSERT INTO position_top_numbers (lottery_type, position, rank, number, percentage)
+        SELECT lottery_type, position, rank, number, percentage
+        FROM (
+            SELECT lottery_type, position, number, percentage,
+                   ROW_NUMBER() OVER (PARTITION BY lottery_type, position ORDER BY frequency DESC, number) AS rank
+            FROM position_frequencies
+            {where}
+        )
+        WHERE rank <= {POSITION_TOP_NUMBERS}
+    ''', params)
+
+def ensure_position_top_numbers(conn: sqlite3.Connection):
+    """Build the top-number rankings for a database whose frequencies predate them."""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'position_frequencies' in tables and 'position_top_numbers' not in tables:
+        refresh_position_top_numbers(conn)
+        conn.commit()